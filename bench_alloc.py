@@ -0,0 +1,142 @@
+# Heap allocation per packet of the bitstring encoding sendData() /
+# receiveData() used to do against complete send() / receiveInto() calls, and
+# per call of the driver's SPI transactions, against a bus that does nothing.
+#
+# On the board every byte allocated is counted (gc.mem_alloc with the collector
+# off), which is what fills the heap and leads to GC pauses. CPython frees
+# objects as soon as they are unused, so there tracemalloc only gives the most
+# a call holds at once, a lower bound. CPython also allocates for every `with`
+# statement (the bound __exit__), which MicroPython does not, so that cost of
+# an empty `with device:` is measured once and left out of the driver's rows.
+import gc
+import math
+
+import registers as regs
+from cpc.cpc import CC1101, FRAME_LENGTH
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+ROUNDS = 100
+SYNCWORD = "666A"
+PAYLOAD = bytes(range(25))
+BITSTRING = "".join(["{0:0>8}".format(bin(x)[2:]) for x in PAYLOAD])
+
+
+def legacyEncode(bitstring, syncword):
+    paddingLen = math.floor((512 - 16 - len(bitstring)) / 8)  # 16 Bits sync word
+    bitstring = (
+        paddingLen * "10101010"
+        + "{0:0>16}".format(bin(int(syncword, 16))[2:])
+        + bitstring
+    )
+    data = []
+    for i in range(0, len(bitstring) // 8):
+        data.append(int(bitstring[i * 8 : i * 8 + 8], 2))
+    return data
+
+
+def legacyDecode(data):
+    dataStr = "".join(
+        list(map(lambda x: "{0:0>8}".format(x[2:]), list(map(bin, data))))
+    )
+    return dataStr[8:]
+
+
+class NullDevice:
+    # SPI device and GDO0 pin that clock nothing
+    value = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def write(self, buffer, start=0, end=None):
+        pass
+
+    def readinto(self, buffer, start=0, end=None, write_value=0):
+        pass
+
+    def write_readinto(
+        self, buffer_out, buffer_in, out_start=0, out_end=None, in_start=0, in_end=None
+    ):
+        pass
+
+
+class EveryEdge:
+    # edge source that has seen a new edge every time it is asked, so a packet
+    # is over as soon as the driver waits for it
+    def __init__(self):
+        self.falls = 0
+
+    def count(self):
+        self.falls += 1
+        return self.falls
+
+
+def allocated(function):
+    # bytes allocated per call of function
+    function()  # first call caches, e.g. the byte time
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        total = 0
+        for _ in range(ROUNDS):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            total += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        return total // ROUNDS
+    gc.disable()
+    before = gc.mem_alloc()
+    for _ in range(ROUNDS):
+        function()
+    total = gc.mem_alloc() - before
+    gc.enable()
+    return total // ROUNDS
+
+
+def entered():
+    with null:
+        pass
+
+
+frame = bytearray(FRAME_LENGTH)
+fifo = bytearray(len(PAYLOAD) + 1)
+received = bytearray(len(PAYLOAD))
+
+null = NullDevice()
+radio = CC1101(
+    None, None, null, 50000, 434400000, SYNCWORD, edges=EveryEdge(), device=null
+)
+overhead = allocated(entered) if tracemalloc is not None else 0
+
+results = (
+    ("old sendData encode", lambda: legacyEncode(BITSTRING, SYNCWORD), 0),
+    ("sendData", lambda: radio.sendData(BITSTRING, SYNCWORD), overhead),
+    ("send", lambda: radio.send(PAYLOAD), overhead),
+    ("old receiveData decode", lambda: legacyDecode(fifo), 0),
+    ("receiveData", lambda: radio.receiveData(len(PAYLOAD)), overhead),
+    ("receiveInto", lambda: radio.receiveInto(received), overhead),
+)
+
+spi = (
+    ("strobe", lambda: radio.strobe(regs.SNOP)),
+    ("writeSingleByte", lambda: radio.writeSingleByte(regs.TXFIFO, 0)),
+    ("readSingleByte", lambda: radio.readSingleByte(regs.RXBYTES)),
+    ("readBurst", lambda: radio.readBurst(regs.RXFIFO, len(PAYLOAD))),
+    ("readBurstInto", lambda: radio.readBurstInto(regs.RXFIFO, received)),
+    ("writeBurst", lambda: radio.writeBurst(regs.TXFIFO, frame, 0, FRAME_LENGTH)),
+)
+
+for name, function, known in results:
+    count = max(0, allocated(function) - known)
+    print("%-24s %6d bytes allocated per packet" % (name, count))
+for name, function in spi:
+    count = max(0, allocated(function) - overhead)
+    print("%-24s %6d bytes allocated per call" % (name, count))
@@ -0,0 +1,144 @@
+# Throughput of cpc.link.Link between two simulated CC1101 radios, one thread
+# per radio as if each had its own host, with and without packet loss. "air %"
+# is the data delivered against the raw data rate, headers, preamble, sync
+# word and CRC leave about 78 % for data at best.
+#
+# The second table moves smaller packets with cpc.adapt stepping data rate
+# and output power, against staying on the first step, for peers received
+# at different levels.
+#
+#     python bench_link.py
+import sys
+import threading
+import time
+
+from cpc import adapt
+from cpc.cpc import CC1101
+from cpc.link import MAX_DATA, Link
+from cpc.sim import SimulatedAir, SimulatedCC1101
+
+FREQUENCY = 434400000
+SYNCWORD = "666A"
+DATARATE = 9600  # both hosts share one CPython process and its GIL
+PACKETS = 100
+TIMEOUT = 60  # s
+
+# small enough for the RX FIFO to hold two, the simulation runs the
+# receiving host in the same process and it may fall behind at higher rates
+ADAPT_SIZE = 24
+ADAPT_PACKETS = 300
+
+
+def pair(air, window, rssi=-60, control=None):
+    # (sender, receiver) links, the sender with `control` if given and the
+    # receiver following its steps
+    links = []
+    for address, peer in ((0x01, 0x02), (0x02, 0x01)):
+        sim = SimulatedCC1101(air, rssi=rssi)
+        radio = CC1101(
+            None,
+            None,
+            sim.gdo0,
+            50000,
+            FREQUENCY,
+            SYNCWORD,
+            device=sim,
+            datarate=DATARATE,
+        )
+        radio.logger = None
+        radio.setPacketMode(address=address)
+        radio.setupRX()
+        if control is None:
+            link = Link(radio, peer, window)
+        elif address == 0x01:
+            link = Link(radio, peer, window, control=control)
+        else:
+            link = Link(radio, peer, window, steps=control.steps)
+        link.open()
+        links.append(link)
+    return links
+
+
+def transfer(loss, window, packets=PACKETS, size=MAX_DATA, rssi=-60, control=None):
+    # (seconds, packets received, sender, receiver) to move `packets`
+    # packets of `size` bytes
+    sender, receiver = pair(SimulatedAir(loss, seed=1), window, rssi, control)
+    data = [bytes([i & 0xFF]) * size for i in range(packets)]
+    got = []
+    done = False
+
+    def receive():
+        while not done:
+            receiver.poll()
+            payload = receiver.receive()
+            while payload is not None:
+                got.append(payload)
+                payload = receiver.receive()
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+    start = time.monotonic()
+    for payload in data:
+        sender.send(payload)
+    try:
+        while sender.pending() and time.monotonic() - start < TIMEOUT:
+            sender.poll()
+        elapsed = time.monotonic() - start
+        time.sleep(0.05)
+    finally:
+        done = True
+        thread.join()
+    assert got == data[: len(got)], "data out of order or corrupted"
+    return elapsed, len(got), sender, receiver
+
+
+def main():
+    sys.setswitchinterval(0.0005)  # two radios in one process
+    print("%-16s %8s %10s %8s %8s %8s %8s" % (
+        "", "packets", "bytes/s", "air %", "retx", "timeouts", "dups"
+    ))  # fmt: skip
+    for loss, window in ((0.0, 1), (0.0, 8), (0.1, 8), (0.3, 8)):
+        elapsed, got, sender, receiver = transfer(loss, window)
+        rate = got * MAX_DATA / elapsed
+        print(
+            "%-16s %8d %10.0f %8.1f %8d %8d %8d"
+            % (
+                "loss %.0f%% w%d" % (loss * 100, window),
+                got,
+                rate,
+                800 * rate / DATARATE,
+                sender.retransmitted,
+                sender.timeouts,
+                receiver.duplicates,
+            )
+        )
+
+    print()
+    print("%-16s %8s %10s %8s %8s %8s %8s" % (
+        "", "packets", "bytes/s", "kBaud", "dBm", "ups", "downs"
+    ))  # fmt: skip
+    for rssi, adaptive in ((-70, False), (-70, True), (-95, True), (-103, True)):
+        control = adapt.RateControl()
+        if not adaptive:
+            control.up = 1000  # never worth a step up
+        elapsed, got, sender, receiver = transfer(
+            0.0, 8, ADAPT_PACKETS, ADAPT_SIZE, rssi, control
+        )
+        step = control.steps[sender.step]
+        peer = control.peer(sender.peer)
+        print(
+            "%-16s %8d %10.0f %8.1f %8d %8d %8d"
+            % (
+                "%s %d dBm" % ("adapt" if adaptive else "fixed", rssi),
+                got,
+                got * ADAPT_SIZE / elapsed,
+                step.modem.datarate / 1000,
+                step.power,
+                peer.ups,
+                peer.downs,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
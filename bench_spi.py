@@ -0,0 +1,85 @@
+# SPI transactions, bytes clocked and wall time of the main driver calls,
+# measured against the simulated CC1101 so it runs on any CPython box:
+#
+#     python bench_spi.py
+import contextlib
+import io
+import itertools
+import time
+
+import registers as regs
+from cpc.cpc import CC1101
+from cpc.hopping import HopPlan
+from cpc.sim import SimulatedCC1101
+
+FREQUENCY = 434400000
+SYNCWORD = "666A"
+PAYLOAD = bytes(range(25))
+
+
+def measure(sim, function, rounds):
+    # (transactions, bytes, seconds) per call of function
+    transactions = sim.transactions
+    clocked = sim.bytes
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):  # the driver's progress output
+        for _ in range(rounds):
+            function()
+    elapsed = time.monotonic() - start
+    return (
+        (sim.transactions - transactions) / rounds,
+        (sim.bytes - clocked) / rounds,
+        elapsed / rounds,
+    )
+
+
+def receive(sim, radio):
+    frame = bytes([0xAA] * 8) + bytes.fromhex(SYNCWORD) + PAYLOAD
+    sim.inject(frame, delay=0.005)
+    radio.receiveData(len(PAYLOAD))
+
+
+def switch(radio):
+    # one RX to TX turnaround and back, with only the differing registers
+    radio.setupTX(partial=True)
+    radio.setupRX(partial=True)
+
+
+def main():
+    sim = SimulatedCC1101()
+    radio = CC1101(None, None, sim.gdo0, 50000, FREQUENCY, SYNCWORD, device=sim)
+    frequencies = itertools.cycle((FREQUENCY, FREQUENCY + 200000))
+    plan = HopPlan(radio, [FREQUENCY + i * 200000 for i in range(8)])
+    plan.calibrate()
+    channels = itertools.cycle(range(len(plan)))
+    bitstring = "".join(["{0:0>8}".format(bin(x)[2:]) for x in PAYLOAD])
+
+    benchmarks = (
+        ("setupRX", radio.setupRX, 20),
+        ("setupTX", radio.setupTX, 20),
+        ("RX <-> TX partial", lambda: switch(radio), 20),
+        ("setFrequency", lambda: radio.setFrequency(next(frequencies), 0), 20),
+        ("hop", lambda: plan.hop(next(channels), regs.SRX), 20),
+        ("sendData", lambda: radio.sendData(bitstring, SYNCWORD), 3),
+        ("receiveData", lambda: receive(sim, radio), 3),
+        ("sendPacket", lambda: radio.sendPacket(PAYLOAD), 10),
+        ("sendMany 10", lambda: radio.sendMany([PAYLOAD] * 10), 1),
+    )
+
+    print("%-18s %12s %10s %12s" % ("", "transactions", "bytes", "ms"))
+    for name, function, rounds in benchmarks:
+        if name == "sendData":
+            radio.setupTX()
+        elif name == "receiveData":
+            radio.setupRX()
+        elif name == "sendPacket":
+            radio.setPacketMode()
+            radio.setupTX()
+        transactions, clocked, seconds = measure(sim, function, rounds)
+        print(
+            "%-18s %12.1f %10.1f %12.3f" % (name, transactions, clocked, seconds * 1000)
+        )
+
+
+if __name__ == "__main__":
+    main()
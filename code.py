@@ -1,10 +1,15 @@
-from cpc.cpc import *
+import board
+import busio
+from digitalio import DigitalInOut
+
+from cpc.cpc import CC1101
 
 myspi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
 cs = DigitalInOut(board.D9)
 gdo0 = DigitalInOut(board.D10)
 
 rx = CC1101(myspi, cs, gdo0, 50000, 434400000, "666A")
+rx.logger = print  # show the received bits
 rx.setupRX()
 while True:
 	rx.receiveData(0x19)
\ No newline at end of file
@@ -5,6 +5,7 @@ import time
 from adafruit_bus_device.spi_device import SPIDevice
 
 import registers as regs
+from cpc import coding, profile
 
 
 def writeSingleByte(address, byte_data):
@@ -54,66 +55,75 @@ gdo0 = DigitalInOut(board.D10)
 device = SPIDevice(mySPI, cs, baudrate=50000, polarity=0, phase=0)
 strobe(regs.SRES)
 
-writeSingleByte(regs.IOCFG2, 0x69)
-writeSingleByte(regs.IOCFG1, 0x6E)
-writeSingleByte(regs.IOCFG0, 0x46)
-writeSingleByte(regs.FIFOTHR, 0x47)
-writeSingleByte(regs.SYNC1, 0x66)
-writeSingleByte(regs.SYNC0, 0x6A)
-writeSingleByte(regs.PKTLEN, 0x0A)
-writeSingleByte(regs.PKTCTRL1, 0x04)
-writeSingleByte(regs.PKTCTRL0, 0x04)
-writeSingleByte(regs.ADDR, 0x00)
-writeSingleByte(regs.CHANNR, 0x00)
-writeSingleByte(regs.FSCTRL1, 0x06)
-writeSingleByte(regs.FSCTRL0, 0x00)
-writeSingleByte(
-    regs.FREQ2, 0x10
-)  # . 0x10 <- 434.4 (theory) # 0x10 <- exactly on 434.4 (measured) .#
-writeSingleByte(
-    regs.FREQ1, 0xB5
-)  # . 0xB5 <- 434.4 (theory) # 0xB5 <- exactly on 434.4 (measured) .#
-writeSingleByte(
-    regs.FREQ0, 0xA9
-)  # . 0x2B <- 434.4 (theory) # 0xA9 <- exactly on 434.4 (measured) .#
-writeSingleByte(regs.MDMCFG4, 0xE7)
-writeSingleByte(regs.MDMCFG3, 0x10)
-writeSingleByte(regs.MDMCFG2, 0x30)  # . 32 would be 16/16 sync word bits .#
-writeSingleByte(regs.MDMCFG1, 0x22)
-writeSingleByte(regs.MDMCFG0, 0xF8)
-writeSingleByte(regs.DEVIATN, 0x15)
-writeSingleByte(regs.MCSM2, 0x07)
-writeSingleByte(regs.MCSM1, 0x20)
-writeSingleByte(regs.MCSM0, 0x18)
-writeSingleByte(regs.FOCCFG, 0x14)
-writeSingleByte(regs.BSCFG, 0x6C)
-writeSingleByte(regs.AGCCTRL2, 0x03)
-writeSingleByte(regs.AGCCTRL1, 0x00)
-writeSingleByte(regs.AGCCTRL0, 0x92)
-writeSingleByte(regs.WOREVT1, 0x87)
-writeSingleByte(regs.WOREVT0, 0x6B)
-writeSingleByte(regs.WORCTRL, 0xFB)
-writeSingleByte(regs.FREND1, 0x56)
-writeSingleByte(regs.FREND0, 0x11)
-writeSingleByte(regs.FSCAL3, 0xE9)
-writeSingleByte(regs.FSCAL2, 0x2A)
-writeSingleByte(regs.FSCAL1, 0x00)
-writeSingleByte(regs.FSCAL0, 0x1F)
-writeSingleByte(regs.RCCTRL1, 0x41)
-writeSingleByte(regs.RCCTRL0, 0x00)
-writeSingleByte(regs.FSTEST, 0x59)
-writeSingleByte(regs.PTEST, 0x7F)
-writeSingleByte(regs.AGCTEST, 0x3F)
-writeSingleByte(regs.TEST2, 0x81)
-writeSingleByte(regs.TEST1, 0x35)
-writeSingleByte(regs.TEST0, 0x0B)
+PROFILE = {
+    "IOCFG2": 0x69,
+    "IOCFG1": 0x6E,
+    "IOCFG0": 0x46,
+    "FIFOTHR": 0x47,
+    "SYNC1": 0x66,
+    "SYNC0": 0x6A,
+    "PKTLEN": 0x0A,
+    "PKTCTRL1": 0x04,
+    "PKTCTRL0": 0x04,
+    "ADDR": 0x00,
+    "CHANNR": 0x00,
+    "FSCTRL1": 0x06,
+    "FSCTRL0": 0x00,
+    "FREQ2": 0x10,  # 0x10 <- 434.4 (theory) # 0x10 <- exactly on 434.4 (measured)
+    "FREQ1": 0xB5,  # 0xB5 <- 434.4 (theory) # 0xB5 <- exactly on 434.4 (measured)
+    "FREQ0": 0xA9,  # 0x2B <- 434.4 (theory) # 0xA9 <- exactly on 434.4 (measured)
+    "MDMCFG4": 0xE7,
+    "MDMCFG3": 0x10,
+    "MDMCFG2": 0x30,  # 32 would be 16/16 sync word bits
+    "MDMCFG1": 0x22,
+    "MDMCFG0": 0xF8,
+    "DEVIATN": 0x15,
+    "MCSM2": 0x07,
+    "MCSM1": 0x20,
+    "MCSM0": 0x18,
+    "FOCCFG": 0x14,
+    "BSCFG": 0x6C,
+    "AGCCTRL2": 0x03,
+    "AGCCTRL1": 0x00,
+    "AGCCTRL0": 0x92,
+    "WOREVT1": 0x87,
+    "WOREVT0": 0x6B,
+    "WORCTRL": 0xFB,
+    "FREND1": 0x56,
+    "FREND0": 0x11,
+    "FSCAL3": 0xE9,
+    "FSCAL2": 0x2A,
+    "FSCAL1": 0x00,
+    "FSCAL0": 0x1F,
+    "RCCTRL1": 0x41,
+    "RCCTRL0": 0x00,
+    "FSTEST": 0x59,
+    "PTEST": 0x7F,
+    "AGCTEST": 0x3F,
+    "TEST2": 0x81,
+    "TEST1": 0x35,
+    "TEST0": 0x0B,
+}
+writeBurst(regs.IOCFG2, list(profile.compileProfile(PROFILE)))
 
 writeBurst(regs.PATABLE, regs.PA_TABLE)
 
-bitstring = "10101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010101010100110011001101010100101011010100101101010101010101001101010010101010110101001011010011010011010101010101001010110011001011001101010011010100110100101100110101010010110011001011010101010010101101000"
-data = []
-for i in range(0, len(bitstring) / 8):
-    data.append(int(bitstring[i * 8 : i * 8 + 8], 2))
+# 39 bytes of preamble, the 666A sync word, the Manchester coded message and
+# its odd last bit, 1 -> 10, padded with zeros
+message = bytes.fromhex("8e7fb839b7f14bbb2f29f1")
+frame = bytearray(64)
+coding.fillPreamble(frame, 0, 39)
+frame[39:41] = b"\x66\x6a"
+coding.manchesterEncode(message, frame, 41)
+frame[63] = 0x80
+# the sync word goes at bit 316, half a byte in: shift the frame right by a
+# nibble with one more nibble of preamble in front
+carry = 0x0A
+for i in range(len(frame)):
+    byte = frame[i]
+    frame[i] = carry << 4 | byte >> 4
+    carry = byte & 0x0F
+data = list(frame)
 
 writeSingleByte(regs.PKTLEN, len(data))
 strobe(regs.SRX)
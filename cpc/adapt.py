@@ -0,0 +1,176 @@
+import registers as regs
+from cpc import modem
+
+# Adaptive data rate and output power. A ladder of steps runs from the most
+# robust setting, the lowest data rate at full power, up to the fastest data
+# rate and from there down in output power:
+#
+#   4 kBaud 10 dBm, 9.6 kBaud 10 dBm, ..., 153.6 kBaud 10 dBm, 153.6 kBaud
+#   7 dBm, ..., 153.6 kBaud -10 dBm
+#
+# Both ends of a link use the same step, so the level a radio receives its
+# peer with is the level the peer receives it with. RateControl keeps the
+# smoothed RSSI and LQI of every peer's packets and the share of packets it
+# had to send again, and once per period moves the peer one step:
+#
+#   down  more than HIGH_LOSS of the packets were lost, the RSSI is less
+#         than DOWN_MARGIN dB over the sensitivity of the current step or
+#         the LQI is above LQI_LIMIT
+#   up    at most LOW_LOSS were lost and the RSSI expected at the next step
+#         (its output power) is UP_MARGIN dB over its sensitivity, for HOLD
+#         periods in a row and not within HOLDOFF periods of a step down
+#
+# The steps are solved once: switching writes MDMCFG4 / MDMCFG3 and the
+# PATABLE entry in use, if they change. cpc.link.Link moves both ends to a new
+# step together:
+#
+#     a = Link(radio_a, 0x02, control=RateControl())  # decides the steps
+#     b = Link(radio_b, 0x01, steps=ladder())  # follows them
+
+# data rate in baud and channel filter bandwidth in Hz, about three times the
+# data rate and at least the narrowest filter
+RATES = (
+    (4000, 58000),
+    (9600, 58000),
+    (19200, 58000),
+    (38400, 116000),
+    (76800, 232000),
+    (153600, 464000),
+)
+POWERS = (10, 7, 5, 0, -10)  # dBm, see regs.PA_LEVELS
+MAX_STEPS = 16  # the step travels in 4 bits of the link header
+
+PERIOD = 16  # packets sent and received per evaluation
+UP_MARGIN = 10  # dB
+DOWN_MARGIN = 4  # dB
+LOW_LOSS = 0.05
+HIGH_LOSS = 0.2
+LQI_LIMIT = 64  # LQI is lower for a better link
+HOLD = 3
+HOLDOFF = 8
+SMOOTHING = 0.125  # weight of a new RSSI / LQI sample
+
+
+class Step:
+    # one operating point, the modem registers solved once
+    def __init__(self, datarate, bandwidth, power, xosc=modem.XOSC):
+        self.modem = modem.solveModem(datarate, bandwidth, None, xosc)
+        self.power = power  # dBm
+        self.patable = regs.PA_LEVELS[power]
+        self.sensitivity = modem.sensitivity(self.modem.datarate)  # dBm
+
+    def apply(self, radio):
+        radio.setModem(self.modem)
+        radio.setPower(self.patable)
+
+
+def ladder(rates=RATES, powers=POWERS, xosc=modem.XOSC):
+    # [Step] from the lowest rate at powers[0] to the highest rate, then on
+    # through the lower powers at the highest rate
+    steps = [Step(rate, width, powers[0], xosc) for rate, width in rates]
+    rate, width = rates[-1]
+    steps += [Step(rate, width, power, xosc) for power in powers[1:]]
+    assert len(steps) <= MAX_STEPS
+    return steps
+
+
+class PeerState:
+    def __init__(self):
+        self.step = 0
+        self.rssi = None  # dBm, smoothed, at the current step
+        self.lqi = None
+        self.received = 0  # packets since the last evaluation
+        self.sent = 0  # the link's counters at the last evaluation
+        self.retransmitted = 0
+        self.loss = 0.0  # share of the packets of the last period sent again
+        self.good = 0  # periods in a row the next step looked good
+        self.holdoff = 0  # periods until the next step up is allowed
+        self.ups = 0
+        self.downs = 0
+
+
+class RateControl:
+    # step decisions for every peer, by address
+    def __init__(
+        self,
+        steps=None,
+        period=PERIOD,
+        up=UP_MARGIN,
+        down=DOWN_MARGIN,
+        hold=HOLD,
+        holdoff=HOLDOFF,
+    ):
+        self.steps = steps if steps is not None else ladder()
+        self.period = period
+        self.up = up
+        self.down = down
+        self.hold = hold
+        self.holdoff = holdoff
+        self.peers = {}
+
+    def peer(self, address):
+        state = self.peers.get(address)
+        if state is None:
+            state = PeerState()
+            self.peers[address] = state
+        return state
+
+    def record(self, address, rssi, lqi):
+        # RSSI in dBm and LQI of a packet received from the peer
+        state = self.peer(address)
+        state.received += 1
+        if state.rssi is None:
+            state.rssi = rssi
+            state.lqi = lqi
+        else:
+            state.rssi += (rssi - state.rssi) * SMOOTHING
+            state.lqi += (lqi - state.lqi) * SMOOTHING
+
+    def decide(self, address, step, sent, retransmitted):
+        # the step to use for the peer, currently on `step`, given the
+        # link's counters of packets sent and sent again
+        state = self.peer(address)
+        if step != state.step:
+            # switched (or fallen back): measure the new step from scratch
+            state.step = step
+            state.rssi = None
+            state.received = 0
+            state.sent = sent
+            state.retransmitted = retransmitted
+            state.good = 0
+        count = sent - state.sent
+        if count + state.received < self.period or state.rssi is None:
+            return step
+        state.loss = (retransmitted - state.retransmitted) / count if count else 0.0
+        state.received = 0
+        state.sent = sent
+        state.retransmitted = retransmitted
+        if state.holdoff:
+            state.holdoff -= 1
+
+        current = self.steps[step]
+        if (
+            state.loss > HIGH_LOSS
+            or state.rssi - current.sensitivity < self.down
+            or state.lqi > LQI_LIMIT
+        ):
+            state.good = 0
+            if step == 0:
+                return step
+            state.holdoff = self.holdoff
+            state.downs += 1
+            return step - 1
+        if step + 1 == len(self.steps) or state.loss > LOW_LOSS:
+            state.good = 0
+            return step
+        following = self.steps[step + 1]
+        expected = state.rssi + following.power - current.power
+        if expected - following.sensitivity < self.up:
+            state.good = 0
+            return step
+        state.good += 1
+        if state.good < self.hold or state.holdoff:
+            return step
+        state.good = 0
+        state.ups += 1
+        return step + 1
@@ -0,0 +1,182 @@
+# Bus backends. The CC1101 object talks to the chip through a `device` used
+# as `with device as d:` around every SPI transaction (chip select held low),
+# with the write(), readinto() and write_readinto() calls of adafruit_bus_device
+# SPIDevice, and reads GDO0 from a pin object with a `value`. Each backend
+# imports its platform modules only when it is created:
+#
+#   CircuitPython   circuitPythonDevice(spi, cs), circuitPythonPin(board.D10)
+#   Linux           SpidevDevice(0, 0), GpioPin("/dev/gpiochip0", 25)
+#   no hardware     cpc.sim.SimulatedCC1101, which is device and pin in one
+
+
+def circuitPythonDevice(spi, cs, baudrate=50000):
+    # SPIDevice on a busio.SPI with `cs` a DigitalInOut
+    from adafruit_bus_device.spi_device import SPIDevice
+
+    return SPIDevice(spi, cs, baudrate=baudrate, polarity=0, phase=0)
+
+
+def circuitPythonPin(pin):
+    # DigitalInOut input for a board pin
+    from digitalio import DigitalInOut
+
+    return DigitalInOut(pin)
+
+
+# linux/spi/spidev.h
+
+SPI_IOC_WR_MODE = 0x40016B01
+SPI_IOC_WR_MAX_SPEED_HZ = 0x40046B04
+SPI_IOC_MESSAGE_1 = 0x40206B00  # one struct spi_ioc_transfer
+SPI_IOC_TRANSFER = "<QQIIHBBBBBB"  # tx_buf, rx_buf, len, speed_hz, ...
+
+# linux/gpio.h, version 1 ABI
+
+GPIO_GET_LINEHANDLE_IOCTL = 0xC16CB403
+GPIOHANDLE_GET_LINE_VALUES_IOCTL = 0xC040B408
+GPIOHANDLE_REQUEST_INPUT = 0x01
+GPIOHANDLE_REQUEST = "<64IL64s32sLi"  # lineoffsets ... lines, fd
+
+
+class SpidevDevice:
+    # /dev/spidev<bus>.<select>, chip select driven by the kernel. The calls
+    # inside one `with` are queued in preallocated buffers and clocked as a
+    # single transfer when the block ends, so chip select stays low for all
+    # of them; the bytes read are copied to their buffers at that point.
+    def __init__(self, bus=0, select=0, baudrate=5000000, size=256):
+        import ctypes
+        import fcntl
+        import os
+        import struct
+
+        self.ctypes = ctypes
+        self.ioctl = fcntl.ioctl
+        self.struct = struct
+        self.fd = os.open("/dev/spidev%d.%d" % (bus, select), os.O_RDWR)
+        self.ioctl(self.fd, SPI_IOC_WR_MODE, struct.pack("<B", 0))
+        self.ioctl(self.fd, SPI_IOC_WR_MAX_SPEED_HZ, struct.pack("<I", baudrate))
+        self.baudrate = baudrate
+        self.transfer = bytearray(struct.calcsize(SPI_IOC_TRANSFER))
+        self.reads = []  # (buffer, start, end, offset) to copy back
+        self.allocate(size)
+
+    def allocate(self, size):
+        # (re)allocate the transfer buffers, only grows past `size` for
+        # transactions longer than that
+        self.tx = bytearray(size)
+        self.rx = bytearray(size)
+        self.txaddress = self.ctypes.addressof(
+            (self.ctypes.c_char * size).from_buffer(self.tx)
+        )
+        self.rxaddress = self.ctypes.addressof(
+            (self.ctypes.c_char * size).from_buffer(self.rx)
+        )
+
+    def __enter__(self):
+        self.length = 0
+        del self.reads[:]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.length:
+            self.struct.pack_into(
+                SPI_IOC_TRANSFER,
+                self.transfer,
+                0,
+                self.txaddress,
+                self.rxaddress,
+                self.length,
+                self.baudrate,
+                0,
+                8,
+                0,
+                0,
+                0,
+                0,
+                0,
+            )
+            self.ioctl(self.fd, SPI_IOC_MESSAGE_1, self.transfer)
+            for buffer, start, end, offset in self.reads:
+                buffer[start:end] = self.rx[offset : offset + end - start]
+        return False
+
+    def queue(self, n):
+        # room for n more bytes, returns their offset
+        offset = self.length
+        if offset + n > len(self.tx):
+            tx = self.tx[:offset]
+            self.allocate(2 * (offset + n))
+            self.tx[:offset] = tx
+        self.length += n
+        return offset
+
+    def write(self, buffer, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        offset = self.queue(end - start)
+        self.tx[offset : offset + end - start] = buffer[start:end]
+
+    def readinto(self, buffer, start=0, end=None, write_value=0):
+        if end is None:
+            end = len(buffer)
+        offset = self.queue(end - start)
+        for i in range(offset, offset + end - start):
+            self.tx[i] = write_value
+        self.reads.append((buffer, start, end, offset))
+
+    def write_readinto(
+        self, buffer_out, buffer_in, out_start=0, out_end=None, in_start=0, in_end=None
+    ):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        assert out_end - out_start == in_end - in_start
+        self.write(buffer_out, out_start, out_end)
+        self.reads.append(
+            (buffer_in, in_start, in_end, self.length - (in_end - in_start))
+        )
+
+    def deinit(self):
+        import os
+
+        os.close(self.fd)
+
+
+class GpioPin:
+    # input line of a Linux GPIO character device (/dev/gpiochipN)
+    def __init__(self, chip, line, label=b"cc1101"):
+        import fcntl
+        import os
+        import struct
+
+        self.ioctl = fcntl.ioctl
+        self.chip = os.open(chip, os.O_RDONLY)
+        offsets = [0] * 64
+        offsets[0] = line
+        request = bytearray(struct.calcsize(GPIOHANDLE_REQUEST))
+        struct.pack_into(
+            GPIOHANDLE_REQUEST,
+            request,
+            0,
+            *offsets,
+            GPIOHANDLE_REQUEST_INPUT,
+            bytes(64),
+            label,
+            1,
+            0,
+        )
+        self.ioctl(self.chip, GPIO_GET_LINEHANDLE_IOCTL, request)
+        self.fd = struct.unpack_from(GPIOHANDLE_REQUEST, request)[-1]
+        self.data = bytearray(64)  # struct gpiohandle_data, reused
+
+    @property
+    def value(self):
+        self.ioctl(self.fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, self.data)
+        return bool(self.data[0])
+
+    def deinit(self):
+        import os
+
+        os.close(self.fd)
+        os.close(self.chip)
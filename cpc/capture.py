@@ -0,0 +1,191 @@
+import struct
+import time
+
+# Binary capture log of received frames for offline analysis and replay.
+#
+# The file starts with MAGIC, followed by one record per frame:
+#
+#   length   u16   payload bytes
+#   time     i64   receive timestamp in ns (time.monotonic_ns by default)
+#   freq     u32   frequency in Hz
+#   rssi     i8    dBm, RSSI_UNKNOWN when the radio did not report one,
+#                  readings below -127 dBm (down to -138) stored as -127
+#   lqi      u8    link quality, CRC_OK in bit 7 as appended by the radio
+#   payload  length bytes, in packet mode everything after the length byte
+#
+# all little endian. A CaptureWriter is set as a radio's `sink` to log every
+# frame the radio receives:
+#
+#     radio.sink = CaptureWriter("/capture.bin")
+#     ...
+#     radio.sink.close()
+#
+# CaptureReader (CPython) memory-maps a log, so frames are read from the page
+# cache as they are used instead of loading the whole file, and replay() sends
+# the frames of a log again with their original timing.
+
+MAGIC = b"CPC1"
+HEADER = "<HqIbB"
+HEADER_SIZE = struct.calcsize(HEADER)
+RSSI_UNKNOWN = -128
+RSSI_MIN = -127  # lowest reading a record holds, RSSI_UNKNOWN is taken
+
+
+class CaptureWriter:
+    # appends records to `target`, a path or a binary file object, through a
+    # buffer of `size` bytes that is written out when full and on flush()
+    def __init__(self, target, size=4096, clock=None):
+        if isinstance(target, str):
+            target = open(target, "ab")
+        self.file = target
+        self.clock = clock if clock is not None else time.monotonic_ns
+        self.buffer = bytearray(size)
+        self.used = 0
+        self.records = 0
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, payload, frequency=0, rssi=RSSI_UNKNOWN, lqi=0, timestamp=None):
+        if timestamp is None:
+            timestamp = self.clock()
+        if rssi != RSSI_UNKNOWN:
+            rssi = max(RSSI_MIN, min(127, rssi))
+        length = len(payload)
+        if self.used + HEADER_SIZE + length > len(self.buffer):
+            self.flush()
+        if HEADER_SIZE + length > len(self.buffer):
+            # larger than the buffer, straight to the file
+            header = bytearray(HEADER_SIZE)
+            struct.pack_into(HEADER, header, 0, length, timestamp, frequency, rssi, lqi)
+            self.file.write(header)
+            self.file.write(payload)
+        else:
+            struct.pack_into(
+                HEADER, self.buffer, self.used, length, timestamp, frequency, rssi, lqi
+            )
+            self.used += HEADER_SIZE
+            self.buffer[self.used : self.used + length] = payload
+            self.used += length
+        self.records += 1
+
+    def flush(self):
+        if self.used:
+            self.file.write(memoryview(self.buffer)[: self.used])
+            self.used = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class Record:
+    __slots__ = ("timestamp", "frequency", "rssi", "lqi", "payload")
+
+    def __init__(self, timestamp, frequency, rssi, lqi, payload):
+        self.timestamp = timestamp
+        self.frequency = frequency
+        self.rssi = rssi
+        self.lqi = lqi
+        self.payload = payload  # bytes
+
+
+class CaptureReader:
+    # iterates or indexes the records of a log without reading it all. Each
+    # payload is copied out of the mapped file as it is read, so records stay
+    # valid after close() and no view keeps the map from closing. A record cut
+    # short at the end of the file is ignored.
+    def __init__(self, path):
+        import mmap
+
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        if self.view[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("not a capture log: %s" % path)
+        self.offsets = None  # record offsets, built on first indexed access
+
+    def record(self, offset):
+        # (Record, offset of the next record) or (None, None) at the end
+        end = offset + HEADER_SIZE
+        if end > len(self.view):
+            return None, None
+        length, timestamp, frequency, rssi, lqi = struct.unpack_from(
+            HEADER, self.view, offset
+        )
+        if end + length > len(self.view):
+            return None, None
+        payload = self.map[end : end + length]
+        return Record(timestamp, frequency, rssi, lqi, payload), end + length
+
+    def __iter__(self):
+        offset = len(MAGIC)
+        while True:
+            record, offset = self.record(offset)
+            if record is None:
+                return
+            yield record
+
+    def index(self):
+        if self.offsets is None:
+            from array import array
+
+            offsets = array("Q")
+            offset = len(MAGIC)
+            while offset + HEADER_SIZE <= len(self.view):
+                length = struct.unpack_from("<H", self.view, offset)[0]
+                if offset + HEADER_SIZE + length > len(self.view):
+                    break
+                offsets.append(offset)
+                offset += HEADER_SIZE + length
+            self.offsets = offsets
+        return self.offsets
+
+    def __len__(self):
+        return len(self.index())
+
+    def __getitem__(self, index):
+        return self.record(self.index()[index])[0]
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def replay(radio, records, speed=1.0, syncword=None):
+    # send every record again with the gaps between their timestamps divided
+    # by `speed`, with sendPacket() after setPacketMode() and send() otherwise.
+    # Returns the number of frames sent.
+    sent = 0
+    start = None
+    for record in records:
+        if start is None:
+            start = time.monotonic_ns() - int(record.timestamp / speed)
+        due = start + int(record.timestamp / speed)
+        delay = due - time.monotonic_ns()
+        if delay > 2000000:
+            time.sleep((delay - 1000000) / 1e9)  # the rest is spun out exactly
+        while time.monotonic_ns() < due:
+            pass
+        if radio.packet is not None:
+            radio.sendPacket(record.payload)
+        else:
+            radio.send(record.payload, syncword)
+        sent += 1
+    return sent
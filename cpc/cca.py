@@ -0,0 +1,99 @@
+import random
+
+import registers as regs
+from cpc import modem
+
+# Listen before talk. With a clear channel assessment mode in MCSM1 CCA_MODE
+# the CC1101 only goes from RX to TX on an STX strobe while the channel is
+# clear, otherwise it stays in RX. STX from IDLE or FSTXON always transmits,
+# so the driver enters RX first (after the calibration from IDLE), waits for
+# the RSSI to settle, strobes STX and reads the state from a following chip
+# status byte, and TXBYTES in case a short frame already went out and the
+# radio is back in RX. A refused STX is retried after a random backoff of
+# 0 .. 2^n - 1 slots, n growing from `exponent[0]` by one per refusal up to
+# `exponent[1]`, until `attempts` STX were refused.
+#
+# The RSSI threshold is set in AGCCTRL1: CARRIER_SENSE_ABS_THR in dB relative
+# to the AGCCTRL2 MAGN_TARGET level (-7 .. 7, see the datasheet and DN022 for
+# the resulting level in dBm) and / or CARRIER_SENSE_REL_THR, a rise of 6, 10
+# or 14 dB over the level the radio measured before.
+#
+#     sense = radio.setCarrierSense(threshold=0)
+#     radio.sendPacket(b"hello")
+#     print(sense.busy, sense.failed)
+
+# MCSM1 CCA_MODE
+CCA_ALWAYS = 0x00
+CCA_RSSI = 0x10  # RSSI below the threshold
+CCA_PACKET = 0x20  # unless currently receiving a packet
+CCA_RSSI_PACKET = 0x30  # both
+
+ABS_THR_DISABLED = 0x08  # CARRIER_SENSE_ABS_THR
+REL_THR = {None: 0, 6: 1, 10: 2, 14: 3}  # dB: CARRIER_SENSE_REL_THR
+
+SLOT = 1000  # us, about 4 bytes at 38.4 kBaud
+ATTEMPTS = 8
+EXPONENT = (1, 6)
+
+LOCK_TIME = 100  # us from SRX until the synthesizer has settled
+
+
+class CarrierSense:
+    # CCA settings applied on top of the RX and TX images, the backoff
+    # parameters and the channel statistics
+    def __init__(
+        self,
+        mode=CCA_RSSI_PACKET,
+        threshold=0,
+        relative=None,
+        slot=SLOT,
+        attempts=ATTEMPTS,
+        exponent=EXPONENT,
+        rng=None,
+    ):
+        assert threshold is None or -7 <= threshold <= 7
+        self.mode = mode
+        self.threshold = threshold  # dB relative to MAGN_TARGET, None for off
+        self.relative = REL_THR[relative]
+        self.slot = slot
+        self.attempts = attempts
+        self.exponent = exponent
+        self.rng = rng if rng is not None else random
+        self.clear = 0  # STX accepted, transmissions started
+        self.busy = 0  # STX refused because the channel was busy
+        self.failed = 0  # transmissions given up after `attempts` refusals
+        self.waited = 0  # us spent in backoff
+
+    def apply(self, image):
+        # write MCSM1 CCA_MODE and the AGCCTRL1 thresholds into a register
+        # image (bytearray)
+        image[regs.MCSM1] = (image[regs.MCSM1] & 0xCF) | self.mode
+        if self.threshold is None:
+            absolute = ABS_THR_DISABLED
+        else:
+            absolute = self.threshold & 0x0F
+        agcctrl1 = image[regs.AGCCTRL1] & 0xC0
+        image[regs.AGCCTRL1] = agcctrl1 | (self.relative << 4) | absolute
+        return image
+
+    def settleTime(self, mdmcfg4, xosc=modem.XOSC):
+        # us from SRX until the RSSI reflects the channel, about 20 samples
+        # of the channel filter after the synthesizer settled
+        return LOCK_TIME + int(20000000 / modem.bandwidth(mdmcfg4, xosc))
+
+    def backoff(self, refusals):
+        # random us to wait after the `refusals`th refused STX
+        low, high = self.exponent
+        exponent = min(low + refusals - 1, high)
+        return self.rng.getrandbits(exponent) * self.slot if exponent else 0
+
+    def busyRatio(self):
+        # fraction of the STX strobes refused
+        strobes = self.clear + self.busy
+        return self.busy / strobes if strobes else 0.0
+
+    def reset(self):
+        self.clear = 0
+        self.busy = 0
+        self.failed = 0
+        self.waited = 0
@@ -0,0 +1,115 @@
+from array import array
+
+# Line coding done by the host, for devices whose coding the CC1101 cannot do
+# in hardware or to build raw frames for send(). Everything works on bytes with
+# precomputed tables, in place or into a caller's buffer.
+#
+# Manchester: every bit becomes two symbols, 1 -> 10 and 0 -> 01 (G.E. Thomas,
+# MSB first). The IEEE 802.3 convention is the inverse, pass ieee=True.
+#
+# PN9 whitening: XOR with the CC1101's PN9 sequence (x^9 + x^5 + 1, seeded with
+# all ones), which starts FF E1 1D 9A ED 85 33 24 and repeats every 511 bytes.
+# Whitening twice restores the data.
+
+PREAMBLE = 0xAA  # 10101010
+INVALID = 0x10  # flag in MANCHESTER_DECODE for a byte with a 00 or 11 symbol
+PN9_PERIOD = 511
+
+
+def manchesterTables():
+    encode = array("H", bytes(512))
+    decode = bytearray(256)
+    for byte in range(256):
+        code = 0
+        for bit in range(7, -1, -1):
+            code = (code << 2) | (0b10 if byte >> bit & 1 else 0b01)
+        encode[byte] = code
+    for code in range(256):
+        nibble = 0
+        valid = True
+        for shift in (6, 4, 2, 0):
+            symbol = code >> shift & 0b11
+            nibble = nibble << 1 | (symbol == 0b10)
+            if symbol == 0b00 or symbol == 0b11:
+                valid = False
+        decode[code] = nibble if valid else nibble | INVALID
+    return encode, decode
+
+
+MANCHESTER_ENCODE, MANCHESTER_DECODE = manchesterTables()
+
+
+def pn9Sequence():
+    sequence = bytearray(PN9_PERIOD)
+    key = 0x1FF
+    for i in range(PN9_PERIOD):
+        sequence[i] = key & 0xFF
+        for _ in range(8):
+            key = (key >> 1) | (((key ^ (key >> 5)) & 1) << 8)
+    return bytes(sequence)
+
+
+PN9 = pn9Sequence()
+
+
+def manchesterEncode(data, out=None, start=0, ieee=False):
+    # encode data into out[start : start + 2 * len(data)], a new bytearray if
+    # out is None. out may be the buffer holding data, which is overwritten.
+    n = len(data)
+    if out is None:
+        out = bytearray(2 * n)
+    invert = 0xFFFF if ieee else 0
+    for i in range(n - 1, -1, -1):  # backwards, so encoding in place works
+        code = MANCHESTER_ENCODE[data[i]] ^ invert
+        out[start + 2 * i] = code >> 8
+        out[start + 2 * i + 1] = code & 0xFF
+    return out
+
+
+def manchesterDecode(data, out=None, start=0, ieee=False):
+    # decode data (an even number of bytes) into out[start : start +
+    # len(data) // 2], a new bytearray if out is None, in place if out is
+    # data. Returns (out, number of bytes with invalid symbols).
+    n = len(data) // 2
+    if out is None:
+        out = bytearray(n)
+    invert = 0xFF if ieee else 0
+    errors = 0
+    for i in range(n):
+        high = MANCHESTER_DECODE[data[2 * i] ^ invert]
+        low = MANCHESTER_DECODE[data[2 * i + 1] ^ invert]
+        if (high | low) & INVALID:
+            errors += 1
+        out[start + i] = (high & 0x0F) << 4 | (low & 0x0F)
+    return out, errors
+
+
+def whiten(buffer, start=0, end=None, offset=0):
+    # XOR buffer[start:end] in place with PN9 from sequence position `offset`,
+    # returns the position to continue from for the next part of a stream
+    if end is None:
+        end = len(buffer)
+    for i in range(start, end):
+        buffer[i] ^= PN9[offset]
+        offset += 1
+        if offset == PN9_PERIOD:
+            offset = 0
+    return offset
+
+
+def fillPreamble(buffer, start=0, end=None, byte=PREAMBLE):
+    if end is None:
+        end = len(buffer)
+    for i in range(start, end):
+        buffer[i] = byte
+    return end
+
+
+def encodeFrame(buffer, payload, syncword, preamble=4, start=0):
+    # `preamble` preamble bytes, the sync word and payload from buffer[start],
+    # returns the index after the payload
+    i = fillPreamble(buffer, start, start + preamble)
+    buffer[i : i + len(syncword)] = syncword
+    i += len(syncword)
+    buffer[i : i + len(payload)] = payload
+    return i + len(payload)
@@ -0,0 +1,92 @@
+# Software sync word search for raw receive, where the radio's sync detector
+# is off (MDMCFG2 SYNC_MODE 0) or cannot match the framing of a device. The
+# data is searched as a bit stream for a 16 or 32 bit sync word at any bit
+# offset, allowing up to `errors` differing bits, and the payload behind a
+# match is shifted back onto byte boundaries.
+#
+# Every byte is shifted into a window of sync word + 8 bits, which is compared
+# against the sync word pre-shifted to each of the 8 bit offsets; differing
+# bits are counted a byte at a time from a table.
+#
+#     correlator = Correlator(b"\x66\x6a", errors=1)
+#     position = correlator.find(data)
+#     if position >= 0:
+#         payload = correlator.payload(data, position, 11)
+
+POPCOUNT = bytes(bin(i).count("1") for i in range(256))
+
+
+class Correlator:
+    def __init__(self, syncword, errors=0):
+        assert len(syncword) in (2, 4)
+        self.bits = 8 * len(syncword)
+        self.errors = errors
+        word = int.from_bytes(syncword, "big")
+        mask = (1 << self.bits) - 1
+        self.window = (1 << (self.bits + 8)) - 1
+        # sync word and its mask ending `shift` bits before the newest bit
+        self.shifted = [word << shift for shift in range(8)]
+        self.masks = [mask << shift for shift in range(8)]
+        self.found = 0  # bit errors of the last match
+
+    def find(self, data, start=0):
+        # bit position right after the first sync word beginning at or after
+        # bit `start` of data, -1 if there is none
+        bits = self.bits
+        errors = self.errors
+        shifted = self.shifted
+        masks = self.masks
+        limit = self.window
+        window = 0
+        for i in range(start >> 3, len(data)):
+            window = ((window << 8) | data[i]) & limit
+            end = 8 * i + 1
+            for shift in range(7, -1, -1):  # earliest end first
+                if end - bits >= start:
+                    difference = (window ^ shifted[shift]) & masks[shift]
+                    count = 0
+                    while difference and count <= errors:
+                        count += POPCOUNT[difference & 0xFF]
+                        difference >>= 8
+                    if count <= errors:
+                        self.found = count
+                        return end
+                end += 1
+        return -1
+
+    def findAll(self, data, start=0):
+        # bit positions after every sync word, the payloads may not overlap
+        # the next sync word
+        while True:
+            position = self.find(data, start)
+            if position < 0:
+                return
+            yield position
+            start = position
+
+    def extract(self, data, position, out, count=None):
+        # bytes from bit `position` of data into out, realigned to byte
+        # boundaries, at most `count` and len(out). Returns the number copied.
+        index = position >> 3
+        shift = position & 7
+        available = len(data) - index - (1 if shift else 0)
+        n = max(0, min(len(out), available))
+        if count is not None:
+            n = min(n, count)
+        if shift == 0:
+            out[:n] = data[index : index + n]
+            return n
+        back = 8 - shift
+        for j in range(n):
+            out[j] = ((data[index + j] << shift) | (data[index + j + 1] >> back)) & 0xFF
+        return n
+
+    def payload(self, data, position, count=None):
+        # extract() into a new bytearray
+        index = position >> 3
+        available = len(data) - index - (1 if position & 7 else 0)
+        if count is not None:
+            available = min(available, count)
+        out = bytearray(max(available, 0))
+        self.extract(data, position, out)
+        return out
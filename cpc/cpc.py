@@ -1,261 +1,1042 @@
-from digitalio import DigitalInOut
-import board
-import busio
 import time
-import math
-from adafruit_bus_device.spi_device import SPIDevice
-from machine import Pin, SPI
 
 import registers as regs
+from cpc import bus, cca, modem, ticks
+from cpc.packet import (
+    MAX_LENGTH,
+    PKTCTRL1_CRC_AUTOFLUSH,
+    Packet,
+    PacketConfig,
+    buildPacket,
+    rssiDbm,
+)
+from cpc.edges import PinEdges
+
+CONFIG_GAP = 2  # clean registers a burst rewrites instead of splitting in two
+
+
+def dirtyRuns(dirty, gap=CONFIG_GAP):
+    # (start, end) address runs of dirty registers, merging runs separated by
+    # no more than `gap` clean registers into a single burst
+    runs = []
+    start = None
+    last = None
+    for address in range(len(dirty)):
+        if dirty[address]:
+            if start is None:
+                start = address
+            elif address - last - 1 > gap:
+                runs.append((start, last + 1))
+                start = address
+            last = address
+    if start is not None:
+        runs.append((start, last + 1))
+    return runs
+
+
+FIFO_SIZE = 64  # bytes in each of the TX and RX FIFOs
+FRAME_LENGTH = FIFO_SIZE  # raw frames fill the TX FIFO: preamble, sync word, payload
+
+
+STATE_TIMEOUT = 5000  # us for a strobe to take effect, calibration included
+
+PACKET_OVERHEAD = 24 + 4 + 2  # longest preamble, sync word and CRC bytes
+
+IDLE = (regs.STATE_IDLE,)  # for waitIdle(), a tuple built per call is garbage
+RX = (regs.STATE_RX,)
+
+# every state but the transitional CALIBRATE and SETTLING
+SETTLED = (
+    regs.STATE_IDLE,
+    regs.STATE_RX,
+    regs.STATE_TX,
+    regs.STATE_FSTXON,
+    regs.STATE_RXFIFO_OVERFLOW,
+    regs.STATE_TXFIFO_UNDERFLOW,
+)
+
+# states a transmission can end in, depending on MCSM1 TXOFF
+TX_DONE = (
+    regs.STATE_IDLE,
+    regs.STATE_FSTXON,
+    regs.STATE_RX,
+    regs.STATE_TXFIFO_UNDERFLOW,
+)
+
+
+def frequencyWord(frequency, offset=0):
+    # FREQ2, FREQ1, FREQ0 for a frequency in Hz, offset in FREQ steps
+    word = int(frequency * (pow(2, 16) / 26000000) + offset)
+    return bytes([(word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF])
+
+
+def parseSyncword(syncword):
+    # 16 bit sync word as a hex string, e.g. "666A", to its two bytes
+    assert len(syncword) == 4
+    return bytes([int(syncword[:2], 16), int(syncword[2:], 16)])
+
+
+def buildFrame(frame, data, syncword):
+    # right-align data behind the sync word and fill the rest with preamble
+    start = len(frame) - len(data)
+    assert start >= 2
+    for i in range(start - 2):
+        frame[i] = 0xAA  # 10101010
+    frame[start - 2] = syncword[0]
+    frame[start - 1] = syncword[1]
+    frame[start:] = data
+    return frame
+
+
+def bitsToBytes(bitstring):
+    # "0"/"1" string, a multiple of 8 bits long, to bytes
+    if len(bitstring) % 8:
+        raise ValueError("bit string of %d bits, not whole bytes" % len(bitstring))
+    if not bitstring:
+        return b""
+    return int(bitstring, 2).to_bytes(len(bitstring) // 8, "big")
+
+
+def bytesToBits(data):
+    return "".join(["{0:0>8}".format(bin(x)[2:]) for x in data])
+
+
+def fifoThresholds(fifothr):
+    # (TX, RX) FIFO thresholds in bytes for a FIFOTHR register value
+    threshold = fifothr & 0x0F
+    return 61 - 4 * threshold, 4 * (threshold + 1)
+
+
+class StreamReader:
+    # reads a header followed by a buffer, or an iterable of buffers, in
+    # FIFO sized pieces while looking one buffer ahead to find the end
+    def __init__(self, header, source):
+        try:
+            source = (memoryview(source),)
+        except TypeError:
+            pass  # iterable of buffers
+        self.chunks = iter(source)
+        self.chunk = memoryview(header)
+        self.offset = 0
+        self.next = next(self.chunks, None)
+        self.count = 0  # bytes read so far
+
+    def remaining(self):
+        # unread bytes once the last buffer is reached, otherwise None
+        if self.next is not None:
+            return None
+        return len(self.chunk) - self.offset
+
+    def readinto(self, buffer, size):
+        n = 0
+        while n < size:
+            if self.offset == len(self.chunk):
+                if self.next is None:
+                    break
+                self.chunk = memoryview(self.next)
+                self.offset = 0
+                self.next = next(self.chunks, None)
+                continue
+            k = min(size - n, len(self.chunk) - self.offset)
+            buffer[n : n + k] = self.chunk[self.offset : self.offset + k]
+            self.offset += k
+            n += k
+        self.count += n
+        return n
 
 
 class CC1101:
     def __init__(
-        self, spi, cs, gdo0, baudrate, frequency, syncword, offset=0
-    ):  # optional frequency offset in Hz
+        self,
+        spi,
+        cs,
+        gdo0,
+        baudrate,
+        frequency,
+        syncword,
+        offset=0,
+        edges=None,
+        device=None,
+        datarate=None,
+    ):  # optional frequency offset in Hz, GDO0 edge source, SPI device, data rate
         self.gdo0 = gdo0
-        self.device = SPIDevice(spi, cs, baudrate=baudrate, polarity=0, phase=0)
-        self.strobe(regs.SRES)  # reset
+        self.edges = edges if edges is not None else PinEdges(gdo0)
+        self.header = bytearray(1)  # burst access header byte
+        self.single = bytearray(2)  # single access header and data byte
+        self.answer = bytearray(2)  # chip status and data byte clocked back
+        self.status = 0  # chip status byte of the last transaction
+        self.deadline = 0  # cpc.ticks by when the frame of startSend() is out
+        self.frame = bytearray(FRAME_LENGTH)  # TX frame built by send()
+        self.burst = bytearray(FIFO_SIZE + 1)  # status and data of readBurst()
+        self.burstView = memoryview(self.burst)
+        self.loaded = bytearray(FIFO_SIZE)  # frame lengths queued by sendMany()
+        self.syncwords = {}  # parsed sync words passed to send()
+        self.rate = None  # MDMCFG4 DRATE_E, MDMCFG3 the byte time is for
+        self.byteTime = 0  # ns to transmit one byte, see airTime()
+        if device is None:
+            device = bus.circuitPythonDevice(spi, cs, baudrate)
+        self.device = device
+        self.modem = None  # modem.ModemConfig set by setSampleRate()
+        self.packet = None  # packet.PacketConfig set by setPacketMode()
+        self.cca = None  # cca.CarrierSense set by setCarrierSense()
+        self.sink = None  # capture.CaptureWriter recording received frames
+        self.continuous = None  # MCSM1, PKTCTRL1 to restore after continuous RX
+        self.meter = None  # instrument.Meter, see stats()
+        self.logger = None  # function for progress messages, e.g. print
+        self.strobe(regs.SRES)  # reset, also loads the shadow registers
 
         self.setFrequency(frequency, offset)
 
-        assert len(syncword) == 4
-        self.writeSingleByte(regs.SYNC1, int(syncword[:2], 16))
-        self.writeSingleByte(regs.SYNC0, int(syncword[2:], 16))
+        self.syncword = parseSyncword(syncword)
+        self.writeBurst(regs.SYNC1, self.syncword)
+
+        if datarate is not None:
+            self.setSampleRate(datarate)
 
-        self.writeBurst(regs.PATABLE, regs.PA_TABLE)
+        self.patable = bytearray(regs.PA_TABLE)  # as written to the chip
+        self.writeBurst(regs.PATABLE, self.patable)
         self.strobe(regs.SFTX)  # flush TX FIFO
         self.strobe(regs.SFRX)  # flush RX FIFO
 
     def setFrequency(self, frequency, offset):
-        frequency_hex = hex(int(frequency * (pow(2, 16) / 26000000) + offset))
+        self.tune(frequencyWord(frequency, offset))
 
-        byte2 = (int(frequency_hex, 16) >> 16) & 0xFF
-        byte1 = (int(frequency_hex) >> 8) & 0xFF
-        byte0 = int(frequency_hex) & 0xFF
-        self.writeSingleByte(regs.FREQ2, byte2)
-        self.writeSingleByte(regs.FREQ1, byte1)
-        self.writeSingleByte(regs.FREQ0, byte0)
+    def tune(self, frequency):
+        # FREQ2, FREQ1, FREQ0 bytes, sent in one burst if any of them changed
+        self.frequency = frequency
+        self.setRegister(regs.FREQ2, frequency[0])
+        self.setRegister(regs.FREQ1, frequency[1])
+        self.setRegister(regs.FREQ0, frequency[2])
+        self.commit()
+
+    def getFrequency(self):
+        # base frequency in Hz
+        word = (self.frequency[0] << 16) | (self.frequency[1] << 8) | self.frequency[2]
+        return word * 26000000 >> 16
 
     def getSampleRate(self, freq_xosc=26000000):
-        drate_mantissa = self.readSingleByte(regs.MDMCFG3)
-        drate_exponent = self.readSingleByte(regs.MDMCFG4) & 0xF
-        sample_rate = (256 + drate_mantissa) * pow(2, drate_exponent - 28) * freq_xosc
-        return sample_rate
+        return modem.dataRate(
+            self.readSingleByte(regs.MDMCFG4),
+            self.readSingleByte(regs.MDMCFG3),
+            freq_xosc,
+        )
 
     def setSampleRate_4000(self):
+        # DRATE_M only, about 4 kBaud with the profiles' DRATE_E = 7. Not
+        # kept across setupRX() / setupTX(), unlike setSampleRate(4000).
         self.writeSingleByte(regs.MDMCFG3, 0x43)
 
-    # TODO: Implement set sample rate function
-    def setSampleRate(self):
-        pass
-
-    def setupRX(self):
-        self.writeSingleByte(regs.IOCFG2, 0x29)
-        self.writeSingleByte(regs.IOCFG1, 0x2E)
-        self.writeSingleByte(regs.IOCFG0, 0x06)
-        self.writeSingleByte(regs.FIFOTHR, 0x47)
-        self.writeSingleByte(regs.PKTCTRL1, 0x00)
-        self.writeSingleByte(regs.PKTCTRL0, 0x00)
-        self.writeSingleByte(regs.ADDR, 0x00)
-        self.writeSingleByte(regs.CHANNR, 0x00)
-        self.writeSingleByte(regs.FSCTRL1, 0x08)
-        self.writeSingleByte(regs.FSCTRL0, 0x00)
-        self.writeSingleByte(regs.MDMCFG4, 0xF7)
-        self.writeSingleByte(regs.MDMCFG3, 0x10)
-        self.writeSingleByte(regs.MDMCFG2, 0x32)
-        self.writeSingleByte(regs.MDMCFG1, 0x22)
-        self.writeSingleByte(regs.MDMCFG0, 0xF8)
-        self.writeSingleByte(regs.DEVIATN, 0x00)
-        self.writeSingleByte(regs.MCSM2, 0x07)
-        self.writeSingleByte(regs.MCSM1, 0x30)
-        self.writeSingleByte(regs.MCSM0, 0x18)
-        self.writeSingleByte(regs.FOCCFG, 0x16)
-        self.writeSingleByte(regs.BSCFG, 0x6C)
-        self.writeSingleByte(regs.AGCCTRL2, 0x06)
-        self.writeSingleByte(regs.AGCCTRL1, 0x00)
-        self.writeSingleByte(regs.AGCCTRL0, 0x95)
-        self.writeSingleByte(regs.WOREVT1, 0x87)
-        self.writeSingleByte(regs.WOREVT0, 0x6B)
-        self.writeSingleByte(regs.WORCTRL, 0xFB)
-        self.writeSingleByte(regs.FREND1, 0xB6)
-        self.writeSingleByte(regs.FREND0, 0x11)
-        self.writeSingleByte(regs.FSCAL3, 0xE9)
-        self.writeSingleByte(regs.FSCAL2, 0x2A)
-        self.writeSingleByte(regs.FSCAL1, 0x00)
-        self.writeSingleByte(regs.FSCAL0, 0x1F)
-        self.writeSingleByte(regs.RCCTRL1, 0x41)
-        self.writeSingleByte(regs.RCCTRL0, 0x00)
-        self.writeSingleByte(regs.FSTEST, 0x59)
-        self.writeSingleByte(regs.PTEST, 0x7F)
-        self.writeSingleByte(regs.AGCTEST, 0x3F)
-        self.writeSingleByte(regs.TEST2, 0x81)
-        self.writeSingleByte(regs.TEST1, 0x35)
-        self.writeSingleByte(regs.TEST0, 0x09)
-
-    def setupTX(self):
-        self.writeSingleByte(regs.IOCFG2, 0x29)
-        self.writeSingleByte(regs.IOCFG1, 0x2E)
-        self.writeSingleByte(regs.IOCFG0, 0x06)
-        self.writeSingleByte(regs.FIFOTHR, 0x47)
-        self.writeSingleByte(regs.PKTCTRL1, 0x00)
-        self.writeSingleByte(regs.PKTCTRL0, 0x00)
-        self.writeSingleByte(regs.ADDR, 0x00)
-        self.writeSingleByte(regs.CHANNR, 0x00)
-        self.writeSingleByte(regs.FSCTRL1, 0x06)
-        self.writeSingleByte(regs.FSCTRL0, 0x00)
-        self.writeSingleByte(regs.MDMCFG4, 0xE7)
-        self.writeSingleByte(regs.MDMCFG3, 0x10)
-        self.writeSingleByte(
-            regs.MDMCFG2, 0x30
-        )  # . 32 would be 16/16 sync word bits .#
-        self.writeSingleByte(regs.MDMCFG1, 0x22)
-        self.writeSingleByte(regs.MDMCFG0, 0xF8)
-        self.writeSingleByte(regs.DEVIATN, 0x15)
-        self.writeSingleByte(regs.MCSM2, 0x07)
-        self.writeSingleByte(regs.MCSM1, 0x20)
-        self.writeSingleByte(regs.MCSM0, 0x18)
-        self.writeSingleByte(regs.FOCCFG, 0x14)
-        self.writeSingleByte(regs.BSCFG, 0x6C)
-        self.writeSingleByte(regs.AGCCTRL2, 0x03)
-        self.writeSingleByte(regs.AGCCTRL1, 0x00)
-        self.writeSingleByte(regs.AGCCTRL0, 0x92)
-        self.writeSingleByte(regs.WOREVT1, 0x87)
-        self.writeSingleByte(regs.WOREVT0, 0x6B)
-        self.writeSingleByte(regs.WORCTRL, 0xFB)
-        self.writeSingleByte(regs.FREND1, 0x56)
-        self.writeSingleByte(regs.FREND0, 0x11)
-        self.writeSingleByte(regs.FSCAL3, 0xE9)
-        self.writeSingleByte(regs.FSCAL2, 0x2A)
-        self.writeSingleByte(regs.FSCAL1, 0x00)
-        self.writeSingleByte(regs.FSCAL0, 0x1F)
-        self.writeSingleByte(regs.RCCTRL1, 0x41)
-        self.writeSingleByte(regs.RCCTRL0, 0x00)
-        self.writeSingleByte(regs.FSTEST, 0x59)
-        self.writeSingleByte(regs.PTEST, 0x7F)
-        self.writeSingleByte(regs.AGCTEST, 0x3F)
-        self.writeSingleByte(regs.TEST2, 0x81)
-        self.writeSingleByte(regs.TEST1, 0x35)
-        self.writeSingleByte(regs.TEST0, 0x0B)
+    def setSampleRate(self, rate, bandwidth=None, deviation=None, freq_xosc=26000000):
+        # data rate in baud, optional channel filter bandwidth and deviation in
+        # Hz. Kept across setupRX() / setupTX(), returns the modem.ModemConfig
+        # with the rates actually set. Without a bandwidth the filter is
+        # widened to fit the rate (modem.defaultBandwidth()), without a
+        # deviation the profile's stays. ValueError for a rate the chip does
+        # not support.
+        if bandwidth is None:
+            bandwidth = modem.defaultBandwidth(rate, deviation)
+        return self.setModem(modem.solveModem(rate, bandwidth, deviation, freq_xosc))
+
+    def setModem(self, config):
+        # switch to a solved modem.ModemConfig, only the registers that change
+        # are written. Kept across setupRX() / setupTX().
+        self.modem = config
+        image = config.apply(bytearray(self.shadow))
+        for address in (regs.MDMCFG4, regs.MDMCFG3, regs.DEVIATN):
+            self.setRegister(address, image[address])
+        self.commit()
+        return config
+
+    def setPower(self, value):
+        # PATABLE value of the entry FREND0 PA_POWER transmits with (the "1"
+        # level for ASK / OOK), see regs.PA_LEVELS. Written only if it changed.
+        index = self.shadow[regs.FREND0] & 0x07
+        if self.patable[index] != value:
+            self.patable[index] = value
+            self.writeBurst(regs.PATABLE, self.patable)
+
+    def setPacketMode(self, address=None, broadcast=True, crc=True, autoflush=True):
+        # variable length packets with the radio's CRC, address filter and
+        # appended RSSI / LQI for sendPacket() / receivePacket(). Kept across
+        # setupRX() / setupTX(), returns the packet.PacketConfig.
+        self.packet = PacketConfig(address, broadcast, crc, autoflush)
+        image = self.packet.apply(bytearray(self.shadow))
+        for address in range(regs.PKTLEN, regs.ADDR + 1):
+            self.setRegister(address, image[address])
+        self.setRegister(regs.MDMCFG2, image[regs.MDMCFG2])
+        self.commit()
+        return self.packet
+
+    def setCarrierSense(
+        self,
+        mode=cca.CCA_RSSI_PACKET,
+        threshold=0,
+        relative=None,
+        slot=cca.SLOT,
+        attempts=cca.ATTEMPTS,
+    ):
+        # listen before talk for send(), sendPacket() and sendMany(): only
+        # transmit while the channel is clear, retrying after a random backoff
+        # (see cpc/cca.py). Kept across setupRX() / setupTX(), returns the
+        # cca.CarrierSense with the channel statistics. cca.CCA_ALWAYS
+        # transmits unconditionally again.
+        sense = cca.CarrierSense(mode, threshold, relative, slot, attempts)
+        image = sense.apply(bytearray(self.shadow))
+        self.setRegister(regs.MCSM1, image[regs.MCSM1])
+        self.setRegister(regs.AGCCTRL1, image[regs.AGCCTRL1])
+        self.commit()
+        self.cca = sense if mode != cca.CCA_ALWAYS else None
+        return sense
+
+    def setupRX(self, partial=False):
+        self.writeConfig(regs.RX_CONFIG, partial)
+
+    def setupTX(self, partial=False):
+        self.writeConfig(regs.TX_CONFIG, partial)
+
+    def writeConfig(self, image, partial=False):
+        # push a full 0x00 - 0x2E register image in one burst, or with
+        # partial=True only the runs that differ from the shadow registers
+        image = bytearray(image)
+        image[regs.SYNC1 : regs.SYNC0 + 1] = self.syncword
+        image[regs.FREQ2 : regs.FREQ0 + 1] = self.frequency
+        if self.modem is not None:
+            self.modem.apply(image)
+        if self.packet is not None:
+            self.packet.apply(image)
+        if self.cca is not None:
+            self.cca.apply(image)
+        self.writeImage(image, partial)
+
+    def loadProfile(self, image, partial=False):
+        # switch to a complete register image such as a profile.ProfileCache
+        # entry, in one burst. Its frequency, sync word and packet settings
+        # are kept for setupRX() / setupTX(), those of setSampleRate() dropped.
+        # setCarrierSense() stays in force: its MCSM1 CCA_MODE and AGCCTRL1
+        # fields replace those of the image.
+        self.frequency = bytes(image[regs.FREQ2 : regs.FREQ0 + 1])
+        self.syncword = bytes(image[regs.SYNC1 : regs.SYNC0 + 1])
+        self.modem = None
+        self.packet = PacketConfig.fromImage(image)
+        if self.cca is not None:
+            image = self.cca.apply(bytearray(image))
+        self.writeImage(image, partial)
+
+    def writeImage(self, image, partial=False):
+        if partial:
+            for address in range(regs.CONFIG_LENGTH):
+                # keep the chip's own calibration results
+                if address not in regs.VOLATILE_CONFIG:
+                    self.setRegister(address, image[address])
+            self.commit()
+        else:
+            self.writeBurst(regs.IOCFG2, image)
+
+    def setRegister(self, address, byte_data):
+        # stage a configuration register write, sent with the next commit()
+        if self.shadow[address] != byte_data or address in regs.VOLATILE_CONFIG:
+            self.shadow[address] = byte_data
+            self.dirty[address] = 1
+
+    def commit(self):
+        for start, end in dirtyRuns(self.dirty):
+            self.writeBurst(start, self.shadow[start:end])
 
     def writeSingleByte(self, address, byte_data):
-        databuffer = bytearray([regs.WRITE_SINGLE_BYTE | address, byte_data])
+        if address < regs.CONFIG_LENGTH:
+            if (
+                self.shadow[address] == byte_data
+                and not self.dirty[address]
+                and address not in regs.VOLATILE_CONFIG
+            ):
+                return
+            self.shadow[address] = byte_data
+            self.dirty[address] = 0
+        self.single[0] = regs.WRITE_SINGLE_BYTE | address
+        self.single[1] = byte_data
         with self.device as d:
-            d.write(databuffer)
+            d.write_readinto(self.single, self.answer)
+        self.status = self.answer[1]
+        if self.meter is not None:
+            self.meter.transaction("writeSingleByte", 2, self.status)
 
     def readSingleByte(self, address):
-        databuffer = bytearray([regs.READ_SINGLE_BYTE | address, 0x00])
-
+        if address < regs.CONFIG_LENGTH and address not in regs.VOLATILE_CONFIG:
+            return self.shadow[address]
+        self.single[0] = regs.READ_SINGLE_BYTE | address
+        self.single[1] = 0x00
         with self.device as d:
-            d.write(databuffer, end=1)
-            d.readinto(databuffer, end=2)
-        return databuffer[0]
+            d.write_readinto(self.single, self.answer)
+        self.status = self.answer[0]
+        if self.meter is not None:
+            self.meter.transaction("readSingleByte", 2, self.status)
+        return self.answer[1]
 
     def readBurst(self, start_address, length):
-        databuffer = []
-        ret = bytearray(length + 1)
-
-        for x in range(length + 1):
-            addr = (start_address + (x * 8)) | regs.READ_BURST
-            databuffer.append(addr)
+        # chip status byte and `length` bytes from start_address, a memoryview
+        # of a buffer that the next readBurst() overwrites. The view is the
+        # only object allocated, readBurstInto() allocates none.
+        assert length < len(self.burst)
+        self.readBurstInto(start_address, self.burst, 1, length + 1)
+        self.burst[0] = self.status
+        return self.burstView[: length + 1]
 
+    def readBurstInto(self, address, buffer, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        self.header[0] = regs.READ_BURST | address
         with self.device as d:
-            d.write_readinto(bytearray(databuffer), ret)
-        return ret
+            d.write_readinto(self.header, self.answer, in_end=1)
+            d.readinto(buffer, start=start, end=end)
+        self.status = self.answer[0]
+        if self.meter is not None:
+            self.meter.transaction("readBurst", 1 + end - start, self.status)
 
-    def writeBurst(self, address, data):
-        temp = list(data)
-        temp.insert(0, (regs.WRITE_BURST | address))
+    def writeBurst(self, address, data, start=0, end=None):
+        # write data[start:end] from `address` on
+        if end is None:
+            end = len(data)
+        if address + end - start <= regs.CONFIG_LENGTH:
+            for i in range(start, end):
+                self.shadow[address + i - start] = data[i]
+                self.dirty[address + i - start] = 0
+        self.header[0] = regs.WRITE_BURST | address
         with self.device as d:
-            d.write(bytearray(temp))
+            d.write_readinto(self.header, self.answer, in_end=1)
+            d.write(data, start=start, end=end)
+        self.status = self.answer[0]
+        if self.meter is not None:
+            self.meter.transaction("writeBurst", 1 + end - start, self.status)
 
     def strobe(self, address):
-        databuffer = bytearray([address, 0x00])
+        if address == regs.SRES:
+            self.shadow = bytearray(regs.RESET_CONFIG)  # config registers
+            self.dirty = bytearray(regs.CONFIG_LENGTH)  # staged by setRegister
+        # a strobe is the header byte alone, anything clocked after it would
+        # be taken as the next header
+        self.header[0] = address
         with self.device as d:
-            d.write(databuffer, end=1)
-            d.readinto(databuffer, end=2)
-        return databuffer
+            d.write_readinto(self.header, self.answer, in_end=1)
+        self.status = self.answer[0]
+        if self.meter is not None:
+            self.meter.transaction("strobe", 1, self.status)
+            self.meter.strobed(address)
+            if self.meter.poll and address != regs.SNOP:
+                status = self.status
+                self.strobe(regs.SNOP)
+                return status
+        return self.status
+
+    def state(self):
+        # STATE_ value of the last chip status byte, see refresh()
+        return (self.status & regs.STATUS_STATE) >> 4
+
+    def refresh(self):
+        # fetch a current chip status byte with SNOP, returns the state
+        self.strobe(regs.SNOP)
+        return self.state()
+
+    def waitState(self, states, timeout=STATE_TIMEOUT):
+        # poll the chip status byte until the state is one of `states`,
+        # timeout in microseconds, returns the state reached
+        deadline = ticks.deadline(timeout)
+        while True:
+            # the deadline is checked first, a status fetched after it still
+            # counts when the thread was held up in between
+            expired = ticks.reached(deadline)
+            state = self.refresh()
+            if state in states:
+                return state
+            if expired:
+                raise RuntimeError(
+                    "timeout waiting for state %r, in %d" % (states, state)
+                )
+
+    def waitIdle(self, timeout=STATE_TIMEOUT):
+        return self.waitState(IDLE, timeout)
+
+    def airTime(self, length):
+        # microseconds to transmit `length` bytes at the configured data rate,
+        # in integers once the byte time for the rate is known
+        rate = (self.shadow[regs.MDMCFG4] & 0x0F) << 8 | self.shadow[regs.MDMCFG3]
+        if rate != self.rate:
+            self.rate = rate
+            self.byteTime = int(8 * 1000000000 / self.getSampleRate())
+        return length * self.byteTime // 1000
+
+    def readRSSI(self):
+        # received signal strength in dBm, valid while the radio is in RX
+        return rssiDbm(self.readSingleByte(regs.RSSI))
+
+    def log(self, *args):
+        if self.logger is not None:
+            self.logger(*args)
+
+    def stats(self):
+        # snapshot of the instrument.Meter set as `meter`, None without one
+        if self.meter is None:
+            return None
+        return self.meter.snapshot()
 
     def setupCheck(self):
         self.strobe(regs.SFRX)
         self.strobe(regs.SRX)
-        print("ready to detect data")
+        self.log("ready to detect data")
 
-    def receiveData(self, length):
+    def startReceive(self, length):
+        # arm RX for a packet of `length` bytes, returns the GDO0 edge count
+        # that changes once the packet has been received
         self.writeSingleByte(regs.PKTLEN, length)
+        edges = self.edges.count()
         self.strobe(regs.SRX)
-        print("waiting for data")
-
-        while not self.gdo0.value:
-            pass
-        # detected rising edge
+        return edges
 
-        while self.gdo0.value:
-            pass
-        # detected falling edge
+    def finishReceive(self, buffer):
+        if self.meter is not None:
+            began = self.meter.clock()
+        self.readBurstInto(regs.RXFIFO, buffer)
 
-        data_len = length  # +2 # add 2 status bytes
-        data = self.readBurst(regs.RXFIFO, data_len)
-        dataStr = "".join(
-            list(map(lambda x: "{0:0>8}".format(x[2:]), list(map(bin, data))))
-        )
-        newStr = dataStr[8:]
-        print("Data: ", newStr)
         self.strobe(regs.SIDLE)
-        while self.readSingleByte(regs.MARCSTATE) != 0x01:
-            pass
+        self.waitIdle()
         self.strobe(regs.SFRX)
-        return newStr
+        if self.sink is not None:
+            self.sink.write(buffer, self.getFrequency())
+        if self.meter is not None:
+            self.meter.received(began)
+        return len(buffer)
 
-    def sendData(self, bitstring, syncword):
-        print("TXBYTES before sendData:", self.readSingleByte(regs.TXBYTES))
-        paddingLen = math.floor((512 - 16 - len(bitstring)) / 8)  # 16 Bits sync word
-        bitstring = (
-            paddingLen * "10101010"
-            + "{0:0>16}".format(bin(int(syncword, 16))[2:])
-            + bitstring
-        )
+    def receiveInto(self, buffer):
+        # receive len(buffer) bytes straight from the RX FIFO into buffer
+        edges = self.startReceive(len(buffer))
+        self.log("waiting for data")
+
+        while self.edges.count() == edges:
+            pass
+        # detected falling edge at the end of the packet
+
+        return self.finishReceive(buffer)
 
-        # print("the bitstring is", len(bitstring), "bits long")
+    async def receiveAsync(self, buffer, interval=0):
+        # receiveInto() that awaits the end of the packet, so other tasks and
+        # radios keep running on the same event loop
+        import asyncio
 
-        data = []
-        for i in range(0, len(bitstring) / 8):
-            data.append(int(bitstring[i * 8 : i * 8 + 8], 2))
+        edges = self.startReceive(len(buffer))
+        while self.edges.count() == edges:
+            await asyncio.sleep(interval)
+        return self.finishReceive(buffer)
 
-        self.writeSingleByte(regs.PKTLEN, len(data))
+    def receiveData(self, length):
+        data = bytearray(length)
+        self.receiveInto(data)
+        newStr = bytesToBits(data)
+        self.log("Data: ", newStr)
+        return newStr
+
+    def prepareSend(self, data, syncword=None):
+        # build the frame for data (bytes, bytearray or memoryview of at most
+        # FRAME_LENGTH - 2 bytes), then idle the radio and flush the TX FIFO
+        if self.logger is not None:
+            self.log("TXBYTES before send:", self.readSingleByte(regs.TXBYTES))
+        buildFrame(self.frame, data, self.syncwordBytes(syncword))
+
+        self.writeSingleByte(regs.PKTLEN, FRAME_LENGTH)
 
         self.strobe(regs.SIDLE)
-        while (
-            self.readSingleByte(regs.MARCSTATE) & 0x1F != 0x01
-        ):  # wait for CC to enter idle state
-            pass
+        self.waitIdle()
         self.strobe(regs.SFTX)  # flush TX FIFO
-        time.sleep(0.05)
-
-        # print(''.join(list(map(lambda x: "{0:0>8}".format(str(bin(x)[2:])), data))))
-        # print("Sending packet of", len(data), "bytes")
-        # print("Data in TXFIFO:\n", self.readBurst(TXFIFO, 64), "\nTXBYTES:", self.readSingleByte(TXBYTES))
-        self.writeBurst(regs.TXFIFO, data)
-        # print("Data in TXFIFO:\n", self.readBurst(TXFIFO, 64), "\nTXBYTES:", self.readSingleByte(TXBYTES))
-        self.strobe(regs.STX)
-
-        remaining_bytes = self.readSingleByte(regs.TXBYTES) & 0x7F
-        while remaining_bytes != 0:
-            time.sleep(0.1)
-            print(
-                "Waiting until all bytes are transmited, remaining bytes: %d"
-                % remaining_bytes
-            )
-            remaining_bytes = self.readSingleByte(regs.TXBYTES) & 0x7F
 
+    def syncwordBytes(self, syncword):
+        # the radio's sync word for None, else the parsed hex string
+        if syncword is None:
+            return self.syncword
+        parsed = self.syncwords.get(syncword)
+        if parsed is None:
+            parsed = parseSyncword(syncword)
+            self.syncwords[syncword] = parsed
+        return parsed
+
+    def startSend(self, length=FRAME_LENGTH, overhead=0):
+        # load `length` bytes of the frame and strobe STX, returns the GDO0
+        # edge count that changes once the frame is out and sets `deadline`
+        # for it. overhead: bytes the radio adds (preamble, sync, CRC).
+        if self.meter is not None:
+            self.meter.loading()
+        self.writeBurst(regs.TXFIFO, self.frame, 0, length)
+        edges = self.edges.count()
+        if self.cca is None:
+            self.strobe(regs.STX)
+        elif not self.listenBeforeTalk():
+            self.deadline = ticks.now()  # the channel stayed busy, nothing sent
+            return edges
+        self.deadline = ticks.deadline(self.airTime(length + overhead))
+        return edges
+
+    def listenBeforeTalk(self):
+        # STX from RX with CCA, retried after a random backoff while the radio
+        # refuses it. True once the radio transmits, False after cca.attempts
+        # refusals, with the radio idle and the frame still in the TX FIFO.
+        sense = self.cca
+        state = self.refresh()
+        if state != regs.STATE_RX:
+            if state == regs.STATE_RXFIFO_OVERFLOW:
+                self.strobe(regs.SFRX)
+            self.strobe(regs.SRX)
+            # from IDLE the synthesizer calibrates first (MCSM0 FS_AUTOCAL),
+            # an STX in CALIBRATE or SETTLING would go by without CCA
+            self.waitState(RX)
+            self.pause(sense.settleTime(self.shadow[regs.MDMCFG4]))
+        loaded = self.readSingleByte(regs.TXBYTES) & 0x7F
+        refusals = 0
+        while True:
+            self.strobe(regs.STX)
+            # a refused STX leaves the radio in RX with the TX FIFO untouched.
+            # An accepted one goes on to TX, unless a short frame is already
+            # out and the radio back in RX (TXOFF_MODE = RX in sendMany()) or
+            # IDLE, which only the TX FIFO tells.
+            state = self.waitState(SETTLED)
+            if (
+                state == regs.STATE_TX
+                or self.readSingleByte(regs.TXBYTES) & 0x7F < loaded
+            ):
+                sense.clear += 1
+                return True
+            sense.busy += 1
+            refusals += 1
+            if refusals == sense.attempts:
+                sense.failed += 1
+                self.strobe(regs.SIDLE)
+                self.waitIdle()
+                return False
+            delay = sense.backoff(refusals)
+            sense.waited += delay
+            self.pause(delay)
+
+    def pause(self, delay):
+        # wait `delay` us, spinning out the last millisecond
+        if delay > 2000:
+            time.sleep((delay - 1000) / 1000000)
+            delay = 1000
+        ticks.delay_us(delay)
+
+    def finishSend(self):
+        # wait for the radio to leave TX, then flush and report the result
+        self.waitState(TX_DONE)
+        if self.meter is not None:
+            self.meter.sent()
+        result = self.sendResult()
         self.strobe(regs.SFTX)
         self.strobe(regs.SFRX)
-        time.sleep(0.05)
+        return result
 
-        if (self.readSingleByte(regs.TXBYTES) & 0x7F) == 0:
-            print("Packet sent!\n\n")
+    def sendResult(self):
+        txbytes = self.readSingleByte(regs.TXBYTES) & 0x7F
+        if txbytes == 0:
+            self.log("Packet sent!\n\n")
             return True
 
         else:
-            print(self.readSingleByte(regs.TXBYTES) & 0x7F)
+            self.log(txbytes)
+            return False
+
+    def send(self, data, syncword=None):
+        self.prepareSend(data, syncword)
+        edges = self.startSend()
+        # GDO0 falls at the end of the packet, the status byte confirms it
+        while self.edges.count() == edges and not ticks.reached(self.deadline):
+            pass
+        return self.finishSend()
+
+    async def sendAsync(self, data, syncword=None, interval=0.01):
+        # send() that awaits instead of sleeping while the frame goes out
+        import asyncio
+
+        self.prepareSend(data, syncword)
+        edges = self.startSend()
+        while self.edges.count() == edges and not ticks.reached(self.deadline):
+            await asyncio.sleep(interval)
+        return self.finishSend()
+
+    def sendData(self, bitstring, syncword):
+        return self.send(bitsToBytes(bitstring), syncword)
+
+    def sendPacket(self, payload, address=None):
+        # transmit payload (at most packet.MAX_LENGTH bytes with the address)
+        # as one variable length packet after setPacketMode(), the radio adds
+        # preamble, sync word and CRC
+        length = buildPacket(self.frame, payload, address)
+        self.strobe(regs.SIDLE)
+        self.waitIdle()
+        self.strobe(regs.SFTX)
+        edges = self.startSend(length, PACKET_OVERHEAD)
+        while self.edges.count() == edges and not ticks.reached(self.deadline):
+            pass
+        return self.finishSend()
+
+    def sendMany(self, payloads, address=None, syncword=None):
+        # transmit every payload of an iterable as its own frame, packets
+        # after setPacketMode() and raw frames as send() otherwise. Between
+        # frames the synthesizer stays on (MCSM1 TXOFF_MODE = FSTXON), so
+        # there is a single calibration, and the next frame is loaded into
+        # the TX FIFO while the current one is on the air if it fits. With
+        # setCarrierSense() the radio returns to RX instead (TXOFF_MODE = RX)
+        # to listen before every frame, and stops when the channel stays busy.
+        # Returns the number of frames sent.
+        if self.packet is not None:
+            overhead = PACKET_OVERHEAD
+        else:
+            overhead = 0
+            self.writeSingleByte(regs.PKTLEN, FRAME_LENGTH)
+        mcsm1 = self.shadow[regs.MCSM1]
+        self.strobe(regs.SIDLE)
+        self.waitIdle()
+        self.strobe(regs.SFTX)
+        if self.cca is None:
+            ready = (regs.STATE_FSTXON, regs.STATE_TXFIFO_UNDERFLOW)
+            self.setRegister(regs.MCSM1, (mcsm1 & 0xFC) | 0x01)  # TXOFF = FSTXON
+            self.commit()
+            self.strobe(regs.SFSTXON)
+            self.waitState(ready)
+        else:
+            # listenBeforeTalk() enters RX itself, a packet received after a
+            # frame may have idled the radio (RXOFF_MODE)
+            ready = (regs.STATE_RX, regs.STATE_IDLE, regs.STATE_TXFIFO_UNDERFLOW)
+            self.setRegister(regs.MCSM1, mcsm1 | 0x03)  # TXOFF = RX
+            self.commit()
+            settle = self.cca.settleTime(self.shadow[regs.MDMCFG4])
+
+        payloads = iter(payloads)
+        length = self.nextFrame(payloads, address, syncword)
+        # lengths of the frames in the TX FIFO, a ring in self.loaded from
+        # index `first` on, so that queueing a frame allocates nothing
+        loaded = self.loaded
+        first = 0
+        queued = 0
+        edges = None  # GDO0 edge count while a frame is on the air
+        deadline = 0
+        retry = ticks.now()  # when enough of the TX FIFO will have drained
+        sent = 0
+        try:
+            while length or queued or edges is not None:
+                if length and ticks.reached(retry):
+                    txbytes = self.readSingleByte(regs.TXBYTES) & 0x7F
+                    if txbytes + length <= FIFO_SIZE:
+                        self.writeBurst(regs.TXFIFO, self.frame, 0, length)
+                        loaded[(first + queued) % FIFO_SIZE] = length
+                        queued += 1
+                        length = self.nextFrame(payloads, address, syncword)
+                        continue
+                    # the FIFO drains a byte per byte time once on the air
+                    self.airTime(0)  # byte time of the current rate
+                    missing = txbytes + length - FIFO_SIZE
+                    retry = ticks.add(ticks.now(), missing * self.byteTime // 1000)
+                if edges is None:
+                    if not queued:
+                        retry = ticks.now()  # nothing on the air, the FIFO is empty
+                        continue
+                    if self.meter is not None:
+                        self.meter.loading()
+                    edges = self.edges.count()
+                    if self.cca is None:
+                        self.strobe(regs.STX)  # from FSTXON, no calibration
+                    elif not self.listenBeforeTalk():
+                        break  # the channel stayed busy
+                    airtime = self.airTime(loaded[first] + overhead)
+                    first = (first + 1) % FIFO_SIZE
+                    queued -= 1
+                    deadline = ticks.deadline(airtime)
+                    continue
+                # a frame is on the air, GDO0 falls at its end
+                ended = self.edges.count() != edges
+                if length and not ended and not ticks.reached(deadline):
+                    continue  # until the next frame fits
+                while not ended and not ticks.reached(deadline):
+                    ended = self.edges.count() != edges
+                state = self.waitState(ready)
+                edges = None
+                if state == regs.STATE_TXFIFO_UNDERFLOW:
+                    # the frames in the FIFO are lost, go on after them
+                    self.strobe(regs.SFTX)
+                    if self.cca is None:
+                        self.strobe(regs.SFSTXON)
+                        self.waitState(ready)
+                    queued = 0
+                    continue
+                if self.meter is not None:
+                    self.meter.sent()
+                sent += 1
+                if self.cca is not None:
+                    self.pause(settle)  # RSSI of the channel after TX
+        finally:
+            self.strobe(regs.SIDLE)
+            self.waitIdle()
+            self.strobe(regs.SFTX)
+            if self.cca is not None:
+                self.strobe(regs.SFRX)  # anything received in between
+            self.setRegister(regs.MCSM1, mcsm1)
+            self.commit()
+        return sent
+
+    def nextFrame(self, payloads, address, syncword):
+        # build the next payload of an iterator into the TX frame, returns
+        # the bytes to load or 0 at the end
+        payload = next(payloads, None)
+        if payload is None:
+            return 0
+        if self.packet is not None:
+            return buildPacket(self.frame, payload, address)
+        buildFrame(self.frame, payload, self.syncwordBytes(syncword))
+        return FRAME_LENGTH
+
+    def receivePacket(self, packet=None):
+        # block until a packet passes the radio's checks and return it, read
+        # into `packet` (a new packet.Packet unless given) after
+        # setPacketMode(). Packets dropped by the radio never reach the host.
+        if packet is None:
+            packet = Packet()
+        while True:
+            edges = self.edges.count()
+            state = self.refresh()
+            if state == regs.STATE_RXFIFO_OVERFLOW:
+                self.strobe(regs.SFRX)
+            if state != regs.STATE_RX:
+                self.strobe(regs.SRX)
+            # GDO0 falls at the end of a packet, and also when the radio
+            # drops one for its address
+            while self.edges.count() == edges:
+                pass
+            if self.readPacket(packet):
+                return packet
+
+    def readPacket(self, packet):
+        # move a received packet from the RX FIFO into `packet`, False if
+        # there is none or the FIFO does not hold exactly one packet
+        if self.meter is not None:
+            began = self.meter.clock()
+        rxbytes = self.readSingleByte(regs.RXBYTES)
+        count = rxbytes & 0x7F
+        if rxbytes & 0x80 or count > len(packet.buffer):
+            self.strobe(regs.SIDLE)
+            self.waitIdle()
+            self.strobe(regs.SFRX)
+            return False
+        if count == 0:
+            return False
+        self.readBurstInto(regs.RXFIFO, packet.buffer, 0, count)
+        if not packet.decode(count, self.packet.addressed()):
             return False
+        self.capture(packet)
+        if self.meter is not None:
+            self.meter.received(began)
+        return True
+
+    def capture(self, packet):
+        # hand a received packet.Packet to the sink, if there is one
+        if self.sink is not None:
+            self.sink.write(
+                packet.view[1 : packet.buffer[0] + 1],
+                self.getFrequency(),
+                packet.rssi,
+                packet.lqi | (0x80 if packet.crc_ok else 0),
+            )
+
+    def rxBytes(self):
+        # RXBYTES may be read while it updates, wait for two equal reads
+        rxbytes = self.readSingleByte(regs.RXBYTES)
+        while True:
+            again = self.readSingleByte(regs.RXBYTES)
+            if again == rxbytes:
+                return rxbytes
+            rxbytes = again
+
+    def startContinuous(self):
+        # packet mode RX that stays in RX after every packet (MCSM1 RXOFF_MODE
+        # = RX), call drain() to move the received packets into a PacketRing.
+        # CRC_AUTOFLUSH would flush every packet in the FIFO, so bad packets
+        # are dropped by drain() instead. GDO0 is high while there is
+        # something to drain (IOCFG0 = 0x01), a level that cannot be missed
+        # like an edge when the host is busy.
+        assert self.packet is not None, "setPacketMode() first"
+        mcsm1 = self.shadow[regs.MCSM1]
+        pktctrl1 = self.shadow[regs.PKTCTRL1]
+        iocfg0 = self.shadow[regs.IOCFG0]
+        self.continuous = (mcsm1, pktctrl1, iocfg0)
+        self.strobe(regs.SIDLE)
+        self.waitIdle()
+        self.strobe(regs.SFRX)
+        self.setRegister(regs.IOCFG0, 0x01)  # RX FIFO >= threshold or packet end
+        self.setRegister(regs.MCSM1, mcsm1 | 0x0C)
+        self.setRegister(regs.PKTCTRL1, pktctrl1 & ~PKTCTRL1_CRC_AUTOFLUSH)
+        self.commit()
+        self.rxslot = None  # packet whose length byte has been read
+        self.strobe(regs.SRX)
+
+    def stopContinuous(self):
+        self.strobe(regs.SIDLE)
+        self.waitIdle()
+        self.strobe(regs.SFRX)
+        mcsm1, pktctrl1, iocfg0 = self.continuous
+        self.setRegister(regs.IOCFG0, iocfg0)
+        self.setRegister(regs.MCSM1, mcsm1)
+        self.setRegister(regs.PKTCTRL1, pktctrl1)
+        self.commit()
+        self.continuous = None
+
+    def drain(self, ring):
+        # move the packets completed so far from the RX FIFO into `ring`,
+        # returns the number added. No SPI traffic while GDO0 is low.
+        if self.gdo0 is not None and not self.gdo0.value:
+            return 0
+        if self.meter is not None:
+            began = self.meter.clock()
+        addressed = self.packet.addressed()
+        added = 0
+        rxbytes = self.rxBytes()
+        available = rxbytes & 0x7F
+        while not rxbytes & 0x80:
+            if self.rxslot is None:
+                if available < 2:  # the last byte may still be written
+                    break
+                self.rxslot = ring.slot()
+                self.readBurstInto(regs.RXFIFO, self.rxslot.buffer, 0, 1)
+                available -= 1
+                if self.rxslot.buffer[0] > MAX_LENGTH:
+                    rxbytes = 0x80  # out of step with the packets, start over
+                    break
+            count = self.rxslot.buffer[0] + 3
+            if available < count - 1:
+                break
+            packet = self.rxslot
+            self.rxslot = None
+            self.readBurstInto(regs.RXFIFO, packet.buffer, 1, count)
+            available -= count - 1
+            if not packet.decode(count, addressed) or not packet.crc_ok:
+                ring.rejected += 1
+            elif ring.push(packet):
+                self.capture(packet)
+                if self.meter is not None:
+                    self.meter.received(began)
+                added += 1
+        if rxbytes & 0x80:
+            # only an overflow idles the radio, the FIFO contents are lost
+            ring.overflows += 1
+            self.rxslot = None
+            self.strobe(regs.SIDLE)
+            self.waitIdle()
+            self.strobe(regs.SFRX)
+            self.strobe(regs.SRX)
+        return added
+
+    def sendStream(self, source, syncword=None, preamble=8):
+        # transmit a buffer or an iterable of buffers of any length as one
+        # packet, refilling the TX FIFO whenever GDO0 reports it dropped below
+        # the FIFOTHR threshold
+        syncword = self.syncwordBytes(syncword)
+        reader = StreamReader(bytes([0xAA] * preamble) + syncword, source)
+        frame = memoryview(self.frame)
+        room = FIFO_SIZE - fifoThresholds(self.readSingleByte(regs.FIFOTHR))[0]
+        iocfg0 = self.readSingleByte(regs.IOCFG0)
+        pktctrl0 = self.readSingleByte(regs.PKTCTRL0)
+
+        self.strobe(regs.SIDLE)
+        self.waitIdle()
+        self.strobe(regs.SFTX)
+
+        self.writeSingleByte(regs.IOCFG0, 0x02)  # high while TX FIFO >= threshold
+        self.writeSingleByte(regs.PKTCTRL0, (pktctrl0 & 0xFC) | 0x02)  # infinite
+        fixed = False
+        started = False
+
+        n = reader.readinto(frame, FIFO_SIZE)
+        while True:
+            remaining = reader.remaining()
+            # the packet ends once the byte counter reaches PKTLEN after
+            # switching to fixed length, so only switch within the last 256
+            if not fixed and remaining is not None:
+                if remaining + FIFO_SIZE < 256:
+                    length = reader.count + remaining
+                    self.writeSingleByte(regs.PKTLEN, length & 0xFF)
+                    self.writeSingleByte(regs.PKTCTRL0, pktctrl0 & 0xFC)
+                    fixed = True
+            self.writeBurst(regs.TXFIFO, frame, 0, n)
+            if not started:
+                self.strobe(regs.STX)
+                started = True
+            if remaining == 0:
+                break
+
+            while self.gdo0.value:
+                pass
+            # TX FIFO below threshold
+            n = reader.readinto(frame, room)
+
+        # at most a full FIFO is still going out
+        state = self.waitState(
+            (regs.STATE_IDLE, regs.STATE_TXFIFO_UNDERFLOW),
+            self.airTime(FIFO_SIZE) + STATE_TIMEOUT,
+        )
+        if state == regs.STATE_TXFIFO_UNDERFLOW:
+            self.strobe(regs.SFTX)
+
+        self.writeSingleByte(regs.PKTCTRL0, pktctrl0)
+        self.writeSingleByte(regs.IOCFG0, iocfg0)
+        return state == regs.STATE_IDLE
+
+    def receiveStream(self, ring, length=None):
+        # generator draining one packet of `length` bytes, or an endless one
+        # with length=None, from the RX FIFO while it is being received. The
+        # bytes go into the caller's ring buffer and each chunk is yielded as
+        # a memoryview of it, valid until the ring wraps around to it again.
+        ring = memoryview(ring)
+        iocfg0 = self.readSingleByte(regs.IOCFG0)
+        pktctrl0 = self.readSingleByte(regs.PKTCTRL0)
+
+        self.strobe(regs.SIDLE)
+        self.waitIdle()
+        self.strobe(regs.SFRX)
+
+        self.writeSingleByte(regs.IOCFG0, 0x01)  # RX FIFO >= threshold or packet end
+        if length is not None and length < 256:
+            self.writeSingleByte(regs.PKTLEN, length)
+            self.writeSingleByte(regs.PKTCTRL0, pktctrl0 & 0xFC)  # fixed
+            fixed = True
+        else:
+            self.writeSingleByte(regs.PKTCTRL0, (pktctrl0 & 0xFC) | 0x02)  # infinite
+            fixed = False
+        self.strobe(regs.SRX)
+
+        try:
+            received = 0
+            head = 0
+            while length is None or received < length:
+                # the byte counter is never more than a FIFO ahead of us
+                if not fixed and length is not None and length - received < 256:
+                    self.writeSingleByte(regs.PKTLEN, length & 0xFF)
+                    self.writeSingleByte(regs.PKTCTRL0, pktctrl0 & 0xFC)
+                    fixed = True
+
+                while not self.gdo0.value:
+                    pass
+
+                rxbytes = self.rxBytes()
+                if rxbytes & 0x80:
+                    raise RuntimeError("RX FIFO overflow")
+
+                n = rxbytes & 0x7F
+                if length is not None and received + n >= length:
+                    n = length - received
+                else:
+                    n -= 1  # the last byte in the FIFO may still be changing
+                while n > 0:
+                    k = min(n, len(ring) - head)
+                    self.readBurstInto(regs.RXFIFO, ring, head, head + k)
+                    yield ring[head : head + k]
+                    head = (head + k) % len(ring)
+                    received += k
+                    n -= k
+        finally:
+            self.strobe(regs.SIDLE)
+            self.waitIdle()
+            self.strobe(regs.SFRX)
+            self.writeSingleByte(regs.PKTCTRL0, pktctrl0)
+            self.writeSingleByte(regs.IOCFG0, iocfg0)
@@ -0,0 +1,60 @@
+# Falling edge sources for the GDO0 line. With the default IOCFG0 = 0x06 GDO0
+# falls at the end of every packet, so counting falling edges tells the driver
+# a packet is complete without watching the line level in a busy loop.
+#
+# Every source has a count() method returning the number of falling edges seen
+# so far, the driver remembers the count before it starts a receive and waits
+# until it changes.
+
+
+class PinEdges:
+    # polls a DigitalInOut-like object with a .value, works with any backend
+    # but only sees edges while count() is called
+    def __init__(self, pin):
+        self.pin = pin
+        self.last = pin.value
+        self.falls = 0
+
+    def count(self):
+        value = self.pin.value
+        if self.last and not value:
+            self.falls += 1
+        self.last = value
+        return self.falls
+
+
+class CounterEdges:
+    # counts edges in the background with countio (CircuitPython). Takes the
+    # board pin, e.g. board.D10, which must not be claimed by a DigitalInOut.
+    def __init__(self, pin):
+        import countio
+
+        self.counter = countio.Counter(pin, edge=countio.Edge.FALL)
+
+    def count(self):
+        return self.counter.count
+
+    def deinit(self):
+        self.counter.deinit()
+
+
+class KeysEdges:
+    # captures edges in the background with keypad (CircuitPython), scanning
+    # every `interval` seconds. Takes the board pin like CounterEdges.
+    def __init__(self, pin, interval=0.001):
+        import keypad
+
+        self.keys = keypad.Keys(
+            (pin,), value_when_pressed=True, pull=False, interval=interval
+        )
+        self.event = keypad.Event()
+        self.falls = 0
+
+    def count(self):
+        while self.keys.events.get_into(self.event):
+            if self.event.released:
+                self.falls += 1
+        return self.falls
+
+    def deinit(self):
+        self.keys.deinit()
@@ -0,0 +1,108 @@
+from cpc.cpc import CC1101
+
+# Several CC1101 radios on one shared SPI bus, each with its own chip select
+# and GDO0 line. The group owns the bus: every SPI transaction of a radio
+# finishes before the next one starts, and all radios are serviced from one
+# polling loop instead of a blocking receive per radio.
+#
+# Each pass of poll() checks the GDO0 edge source of every radio and reads at
+# most one packet per radio, starting one radio further each pass, so a
+# received packet waits at most one pass no matter how busy the others are.
+#
+# The group takes no lock of its own. SPIDevice locks the bus for each single
+# transaction, but a receive or send is a sequence of them, and poll() and
+# send() share the per-radio state above. Use a group from one thread (or one
+# asyncio event loop) and call send()/sendAsync() from the loop that polls.
+
+
+class RadioGroup:
+    def __init__(self, spi, baudrate=50000):
+        self.spi = spi
+        self.baudrate = baudrate
+        self.radios = []
+        self.buffers = []  # packet buffer per radio, reused for every packet
+        self.handlers = []  # handler(radio, buffer) per radio
+        self.armed = []  # GDO0 edge count per radio while listening, else None
+        self.next = 0  # radio the next pass starts with
+
+    def add(
+        self,
+        cs,
+        gdo0,
+        frequency,
+        syncword,
+        length,
+        handler,
+        offset=0,
+        edges=None,
+        device=None,
+    ):
+        # add a radio receiving packets of `length` bytes, returns the CC1101.
+        # gdo0 is any pin with .value and device= any bus backend, see
+        # cpc.bus, for a radio not on CircuitPython's SPIDevice.
+        radio = CC1101(
+            spi=self.spi,
+            cs=cs,
+            gdo0=gdo0,
+            baudrate=self.baudrate,
+            frequency=frequency,
+            syncword=syncword,
+            offset=offset,
+            edges=edges,
+            device=device,
+        )
+        radio.setupRX()
+        self.radios.append(radio)
+        self.buffers.append(bytearray(length))
+        self.handlers.append(handler)
+        self.armed.append(radio.startReceive(length))
+        return radio
+
+    def poll(self):
+        # one round robin pass over all radios, returns the packets dispatched
+        count = len(self.radios)
+        dispatched = 0
+        for i in range(count):
+            index = (self.next + i) % count
+            armed = self.armed[index]
+            radio = self.radios[index]
+            if armed is None or radio.edges.count() == armed:
+                continue
+            buffer = self.buffers[index]
+            radio.finishReceive(buffer)
+            self.handlers[index](radio, buffer)
+            self.armed[index] = radio.startReceive(len(buffer))
+            dispatched += 1
+        if count:
+            self.next = (self.next + 1) % count
+        return dispatched
+
+    async def run(self, interval=0):
+        # poll all radios forever, yielding to other tasks between passes
+        import asyncio
+
+        while True:
+            self.poll()
+            await asyncio.sleep(interval)
+
+    def send(self, radio, data, syncword=None):
+        # transmit on one radio of the group while the others keep listening
+        index = self.radios.index(radio)
+        self.armed[index] = None
+        radio.setupTX(partial=True)
+        result = radio.send(data, syncword)
+        self.listen(index)
+        return result
+
+    async def sendAsync(self, radio, data, syncword=None):
+        index = self.radios.index(radio)
+        self.armed[index] = None
+        radio.setupTX(partial=True)
+        result = await radio.sendAsync(data, syncword)
+        self.listen(index)
+        return result
+
+    def listen(self, index):
+        radio = self.radios[index]
+        radio.setupRX(partial=True)
+        self.armed[index] = radio.startReceive(len(self.buffers[index]))
@@ -0,0 +1,126 @@
+import time
+from array import array
+
+import registers as regs
+from cpc import modem
+from cpc.cpc import frequencyWord
+
+# Fast frequency hopping. Calibrating the synthesizer takes about 720 us per
+# SCAL, and with the default MCSM0 FS_AUTOCAL the chip recalibrates on every
+# IDLE -> RX / TX transition. A HopPlan calibrates every channel once up front,
+# keeps the FSCAL3 / FSCAL2 / FSCAL1 results next to the channel's tuning
+# bytes, and on a hop writes both back with autocalibration switched off:
+#
+#   SIDLE, FREQ2..FREQ0 (or CHANNR) burst, FSCAL3..FSCAL1 burst, SRX / STX
+#
+# Calibration results drift with temperature and supply voltage, so call
+# calibrate() again every now and then on a long running link. The first hop
+# saves the radio's FS_AUTOCAL setting, close() puts it back once the plan is
+# no longer used.
+
+FSCAL_LENGTH = 3  # FSCAL3, FSCAL2, FSCAL1
+
+LOCK_TIME = 0.0001  # IDLE -> RX without calibration, synthesizer settled
+
+
+def settleTime(mdmcfg4, xosc=modem.XOSC):
+    # seconds from SRX until RSSI reflects the channel: synthesizer lock plus
+    # about 20 samples of the channel filter, roughly 0.45 ms at the RX
+    # image's 58 kHz and 0.12 ms at 812 kHz
+    return LOCK_TIME + 20 / modem.bandwidth(mdmcfg4, xosc)
+
+
+def quietest(levels, count=1):
+    # indices of the `count` channels with the lowest RSSI, quietest first
+    order = sorted(range(len(levels)), key=levels.__getitem__)
+    return order[:count]
+
+
+class HopPlan:
+    def __init__(self, radio, frequencies=None, channels=None, offset=0):
+        # either absolute frequencies in Hz, written to FREQ2..FREQ0, or CHANNR
+        # channel numbers on top of the radio's current base frequency
+        assert (frequencies is None) != (channels is None)
+        self.radio = radio
+        if frequencies is not None:
+            self.address = regs.FREQ2
+            self.tuning = [frequencyWord(f, offset) for f in frequencies]
+        else:
+            self.address = regs.CHANNR
+            self.tuning = [bytes([channel]) for channel in channels]
+        self.calibration = [None] * len(self.tuning)  # FSCAL3, FSCAL2, FSCAL1
+        self.current = None
+        self.autocal = None  # MCSM0 FS_AUTOCAL bits to restore, see close()
+
+    def __len__(self):
+        return len(self.tuning)
+
+    def calibrate(self):
+        # one SCAL per channel, leaves the radio idle on the last channel
+        radio = self.radio
+        radio.strobe(regs.SIDLE)
+        radio.waitIdle()
+        for index in range(len(self.tuning)):
+            self.retune(index)
+            radio.commit()
+            radio.strobe(regs.SCAL)
+            radio.waitIdle()
+            calibration = self.calibration[index] or bytearray(FSCAL_LENGTH)
+            radio.readBurstInto(regs.FSCAL3, calibration)
+            self.calibration[index] = calibration
+        self.current = len(self.tuning) - 1 if self.tuning else None
+
+    def hop(self, index, strobe=None):
+        # move to channel `index` without a calibration, then optionally strobe
+        # regs.SRX or regs.STX
+        radio = self.radio
+        calibration = self.calibration[index]
+        assert calibration is not None, "calibrate() first"
+        radio.strobe(regs.SIDLE)
+        radio.waitIdle()  # the synthesizer must be off to take the new values
+        self.retune(index)
+        mcsm0 = radio.shadow[regs.MCSM0]
+        if self.autocal is None:
+            self.autocal = mcsm0 & 0x30
+        # FS_AUTOCAL = never, otherwise the next SRX / STX overwrites FSCAL
+        radio.setRegister(regs.MCSM0, mcsm0 & 0xCF)
+        radio.setRegister(regs.FSCAL3, calibration[0])
+        radio.setRegister(regs.FSCAL2, calibration[1])
+        radio.setRegister(regs.FSCAL1, calibration[2])
+        radio.commit()
+        self.current = index
+        if strobe is not None:
+            radio.strobe(strobe)
+
+    def sweep(self, levels=None, settle=None):
+        # RSSI in dBm of every channel into an array("b") (a new one unless
+        # `levels` is given), with the cached calibration and the radio's
+        # current RX settings. Leaves the radio idle.
+        radio = self.radio
+        if levels is None:
+            levels = array("b", bytes(len(self.tuning)))
+        if settle is None:
+            settle = settleTime(radio.shadow[regs.MDMCFG4])
+        for index in range(len(self.tuning)):
+            self.hop(index, regs.SRX)
+            time.sleep(settle)
+            levels[index] = max(-128, radio.readRSSI())
+        radio.strobe(regs.SIDLE)
+        return levels
+
+    def close(self):
+        # restore the FS_AUTOCAL setting the first hop() switched off
+        if self.autocal is None:
+            return
+        radio = self.radio
+        radio.setRegister(regs.MCSM0, (radio.shadow[regs.MCSM0] & 0xCF) | self.autocal)
+        radio.commit()
+        self.autocal = None
+
+    def retune(self, index):
+        # stage the tuning bytes of a channel on the radio
+        tuning = self.tuning[index]
+        for i in range(len(tuning)):
+            self.radio.setRegister(self.address + i, tuning[i])
+        if self.address == regs.FREQ2:
+            self.radio.frequency = tuning
@@ -0,0 +1,151 @@
+import time
+from array import array
+
+import registers as regs
+
+# Opt-in driver instrumentation. Set a Meter as a radio's `meter` and the
+# driver reports to it:
+#
+#   spi         calls and bytes clocked per transaction method
+#   send        us from loading the TX FIFO until the radio has left TX
+#   receive     us from the end of a packet being seen until it is read out
+#   turnaround  us from the end of a packet (received or sent) until the
+#               strobe that turns the radio the other way (STX or SRX)
+#   trace       the last `trace` changes of the radio state (the MARCSTATE
+#               summary in the chip status byte) seen in transactions, with
+#               the time in us since the Meter was created. A strobe answers
+#               with the state from before it, with poll=True the driver
+#               follows every strobe with an SNOP to see the state it led to.
+#
+# Latencies go into histograms of power of two buckets: bucket 0 counts
+# times below 1 us, bucket n times from 2^(n-1) up to 2^n us, the last bucket
+# everything longer. The histograms and the trace are preallocated, and a
+# radio without a meter only pays an `is None` check per transaction.
+#
+#     radio.meter = Meter()
+#     ...
+#     print(radio.stats())
+
+BINS = 20  # the last bucket starts at 2^18 us, about 0.26 s
+TRACE_LENGTH = 64
+
+STATE_NAMES = (
+    "IDLE",
+    "RX",
+    "TX",
+    "FSTXON",
+    "CALIBRATE",
+    "SETTLING",
+    "RXFIFO_OVERFLOW",
+    "TXFIFO_UNDERFLOW",
+)
+
+
+class Histogram:
+    def __init__(self, bins=BINS):
+        self.bins = array("L", [0] * bins)
+        self.count = 0
+        self.total = 0  # us
+        self.min = None
+        self.max = 0
+
+    def record(self, us):
+        bucket = 0
+        rest = us
+        last = len(self.bins) - 1
+        while rest and bucket < last:
+            rest >>= 1
+            bucket += 1
+        self.bins[bucket] += 1
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total // self.count if self.count else None,
+            "bins": list(self.bins),
+        }
+
+
+class Meter:
+    def __init__(self, trace=TRACE_LENGTH, poll=False, clock=None):
+        self.poll = poll
+        self.clock = clock if clock is not None else time.monotonic_ns
+        self.started = self.clock()
+        self.calls = {}  # transaction method: calls
+        self.bytes = {}  # transaction method: bytes clocked
+        self.send = Histogram()
+        self.receive = Histogram()
+        self.turnaround = Histogram()
+        self.times = array("L", [0] * trace)  # us since started, wraps
+        self.states = bytearray(trace)
+        self.traced = 0  # state changes seen, the last len(states) are kept
+        self.state = None
+        self.ended = None  # (regs.STX or regs.SRX, ns) to turn around with
+        self.sending = 0  # ns the current transmission started
+
+    def transaction(self, method, length, status):
+        # one SPI transaction of `length` bytes answered with `status`
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.bytes[method] = self.bytes.get(method, 0) + length
+        state = (status & regs.STATUS_STATE) >> 4
+        if state != self.state:
+            self.state = state
+            index = self.traced % len(self.states)
+            self.states[index] = state
+            self.times[index] = ((self.clock() - self.started) // 1000) & 0xFFFFFFFF
+            self.traced += 1
+
+    def strobed(self, address):
+        # STX after a received packet or SRX after a sent one turns around
+        if self.ended is not None and self.ended[0] == address:
+            self.turnaround.record((self.clock() - self.ended[1]) // 1000)
+            self.ended = None
+
+    def loading(self):
+        # the TX FIFO is about to be loaded
+        self.sending = self.clock()
+
+    def sent(self):
+        now = self.clock()
+        self.send.record((now - self.sending) // 1000)
+        self.ended = (regs.SRX, now)
+
+    def received(self, began):
+        now = self.clock()
+        self.receive.record((now - began) // 1000)
+        self.ended = (regs.STX, now)
+
+    def trace(self):
+        # [(us, state name)] oldest first
+        n = min(self.traced, len(self.states))
+        first = self.traced - n
+        return [
+            (
+                self.times[i % len(self.states)],
+                STATE_NAMES[self.states[i % len(self.states)]],
+            )
+            for i in range(first, self.traced)
+        ]
+
+    def snapshot(self):
+        return {
+            "spi": {
+                method: (self.calls[method], self.bytes[method])
+                for method in self.calls
+            },
+            "send": self.send.snapshot(),
+            "receive": self.receive.snapshot(),
+            "turnaround": self.turnaround.snapshot(),
+            "trace": self.trace(),
+        }
+
+    def reset(self):
+        self.__init__(len(self.states), self.poll, self.clock)
@@ -0,0 +1,463 @@
+import random
+
+from cpc import ticks
+from cpc.cpc import PACKET_OVERHEAD
+from cpc.packet import MAX_LENGTH, PacketRing
+
+# Reliable point to point link on top of packet mode. Every packet carries a
+# header in front of its data:
+#
+#   kind | seq | ack | sack (2 bytes, big endian) | data
+#
+#   kind  DATA for a packet with data, POLL on the last packet of a burst
+#         asks the peer to acknowledge right away
+#   seq   sequence number of the data, modulo 256
+#   ack   next sequence number expected from the peer, everything before it
+#         has been received
+#   sack  bit i set: ack + 1 + i has been received as well (selective ACK)
+#
+# Acknowledgements ride along on data packets, a receiver with nothing to
+# send answers a POLL with a header-only packet. Up to `window` packets are
+# in flight, sent back to back with CC1101.sendMany() so the link keeps the
+# air busy instead of waiting a round trip per packet.
+#
+# A packet is sent again when a packet sent after it has been acknowledged
+# (it was lost, the CC1101 does not reorder). When the retransmission timer
+# runs out the oldest unacknowledged packet is sent again. The timeout
+# follows the measured round trip times (RFC 6298, samples only from packets
+# sent once), the timer starts when a burst is out and doubles on every
+# expiry. It runs out at a random point up to a quarter of a timeout late,
+# two ends that time out together would otherwise keep sending into each
+# other. The receiver keeps packets that arrive ahead of a gap, delivers data
+# in order and drops duplicates.
+#
+# With a ladder of cpc.adapt steps (data rate and output power) the upper
+# four bits of kind carry the step the sender asks for. The end with an
+# adapt.RateControl decides the steps, the other end answers at the current
+# step and then follows, the deciding end switches once the answer has come
+# back (or after two timeouts, the answer may have been lost).
+# Both ends return to step 0 when they have not heard from each other for
+# `fallback` us.
+#
+# Both ends start at sequence number 0, there is no connection setup. The
+# radio has to be in packet mode with its own address:
+#
+#     radio.setPacketMode(address=0x01)
+#     link = Link(radio, peer=0x02)
+#     link.open()
+#     link.send(b"hello")
+#     while True:
+#         link.poll()
+#         data = link.receive()
+
+DATA = 0x01
+POLL = 0x02
+
+HEADER = 5  # kind, seq, ack, sack
+MAX_DATA = MAX_LENGTH - 1 - HEADER  # the address byte counts towards MAX_LENGTH
+MAX_WINDOW = 16  # packets in flight, one sack bit each past the cumulative ack
+
+INITIAL_RTO = 200000  # us until the first round trip has been measured
+MIN_RTO = 5000  # us
+MAX_RTO = 2000000  # us
+
+TURNAROUND = 3000  # us the peer needs after a packet to get back into RX
+FALLBACK = 2000000  # us without a packet from the peer before going to step 0
+
+
+class Link:
+    def __init__(
+        self,
+        radio,
+        peer,
+        window=8,
+        slots=8,
+        turnaround=TURNAROUND,
+        steps=None,
+        control=None,
+        fallback=FALLBACK,
+        rng=None,
+    ):
+        assert radio.packet is not None, "setPacketMode() first"
+        assert 1 <= window <= MAX_WINDOW
+        self.radio = radio
+        self.peer = peer  # address the packets are sent to
+        self.window = window
+        self.ring = PacketRing(slots)
+
+        # adaptation: [adapt.Step], the same on both ends, and on one end the
+        # adapt.RateControl deciding which one to use
+        self.control = control
+        if steps is None and control is not None:
+            steps = control.steps
+        assert steps is None or len(steps) <= 16
+        self.steps = steps
+        self.step = 0  # the step the radio is on
+        self.target = 0  # the step asked for in the packets sent
+        self.echoed = False  # the peer asked for the target step as well
+        self.unanswered = 0  # timeouts while asking for another step
+        self.fallback = fallback
+        self.heard = 0  # ticks of the last packet from the peer
+
+        # sender: slots indexed by seq % MAX_WINDOW
+        self.frames = [bytearray(HEADER + MAX_DATA) for _ in range(MAX_WINDOW)]
+        self.views = [memoryview(frame) for frame in self.frames]
+        self.lengths = [0] * MAX_WINDOW
+        self.acked = [False] * MAX_WINDOW
+        self.resend = [False] * MAX_WINDOW  # marked for retransmission
+        self.tries = [0] * MAX_WINDOW  # transmissions of the packet in the slot
+        self.order = [0] * MAX_WINDOW  # number of the latest transmission
+        self.sentAt = [0] * MAX_WINDOW  # ticks the latest burst with it was out
+        self.queue = []  # data waiting for a slot
+        self.base = 0  # oldest unacknowledged seq
+        self.next = 0  # seq of the next new packet
+        self.transmissions = 0  # packets handed to the radio, numbers them
+        self.delivered = 0  # latest transmission known to have arrived
+        self.burst = []  # slots of the packets in the next burst
+
+        # receiver
+        self.expected = 0  # next seq to deliver
+        self.held = [None] * MAX_WINDOW  # data received ahead of a gap
+        self.heldSeq = [0] * MAX_WINDOW
+        self.received = []  # data delivered in order, taken by receive()
+        self.ackNow = False  # the peer polled
+        self.ackDue = None  # ticks to acknowledge by after data without POLL
+        self.reply = bytearray(HEADER)  # header-only acknowledgement
+        self.turnaround = turnaround
+        self.quiet = None  # ticks before which the peer may not be listening yet
+
+        # retransmission timer, us
+        self.srtt = None
+        self.rttvar = 0
+        self.rto = INITIAL_RTO
+        self.deadline = None  # ticks the timer runs out, None while idle
+        self.rng = rng if rng is not None else random
+
+        self.ackDelay = 0  # us, see use()
+
+        # statistics
+        self.sent = 0  # packets with data, retransmissions included
+        self.retransmitted = 0
+        self.timeouts = 0
+        self.acks = 0  # header-only packets sent
+        self.duplicates = 0  # packets received again
+        self.malformed = 0  # packets too short for the header
+        self.rssi = None  # dBm and LQI of the last packet from the peer
+        self.lqi = None
+        self.switches = 0  # step changes, fallbacks included
+
+        self.use(0)
+
+    def open(self):
+        # start listening, RX stays on between the link's own bursts
+        self.heard = ticks.now()
+        self.radio.startContinuous()
+
+    def close(self):
+        self.radio.stopContinuous()
+
+    def inFlight(self):
+        return (self.next - self.base) & 0xFF
+
+    def pending(self):
+        # data not acknowledged yet, queued or in flight
+        return len(self.queue) + self.inFlight()
+
+    def send(self, data):
+        # queue up to MAX_DATA bytes, sent in order with the rest
+        assert len(data) <= MAX_DATA
+        self.queue.append(bytes(data))
+
+    def receive(self):
+        # the next data in order, None if there is none yet
+        if not self.received:
+            return None
+        return self.received.pop(0)
+
+    def poll(self):
+        # handle the packets received so far, the retransmission timer and a
+        # due acknowledgement, then send what the window allows. Returns the
+        # number of packets sent.
+        radio = self.radio
+        while radio.drain(self.ring):
+            packet = self.ring.get()
+            while packet is not None:
+                self.handle(packet)
+                packet = self.ring.get()
+        now = ticks.now()
+        if self.steps is not None:
+            if self.step and ticks.diff(now, self.heard) > self.fallback:
+                self.switch(0)  # lost each other, start over
+            if self.control is not None and self.target == self.step:
+                self.target = self.control.decide(
+                    self.peer, self.step, self.sent, self.retransmitted
+                )
+        if self.deadline is not None and ticks.diff(now, self.deadline) >= 0:
+            self.expire()
+        if self.quiet is not None:
+            if ticks.diff(self.quiet, now) > 0:
+                return 0  # the peer has just sent and is turning around
+            self.quiet = None
+        self.fill()
+        del self.burst[:]
+        for i in range(self.inFlight()):
+            slot = (self.base + i) % MAX_WINDOW
+            if self.resend[slot]:
+                self.burst.append(slot)
+        for i in range(self.inFlight()):
+            slot = (self.base + i) % MAX_WINDOW
+            if not self.tries[slot]:
+                self.burst.append(slot)
+        if self.burst:
+            return self.transmit()
+        if self.ackNow or (
+            self.ackDue is not None and ticks.diff(now, self.ackDue) >= 0
+        ):
+            self.header(self.reply, 0, 0)
+            self.acks += 1
+            self.flush([self.reply])
+            return 1
+        return 0
+
+    def flush(self, payloads):
+        # send the payloads in one burst and go back to listening. Each
+        # packet tells the peer everything received so far.
+        radio = self.radio
+        radio.stopContinuous()
+        try:
+            if self.echoed:
+                self.use(self.target)
+            sent = radio.sendMany(payloads, self.peer)
+            if self.target != self.step and self.control is None:
+                self.use(self.target)  # the peer asked for it, and got the echo
+        finally:
+            radio.startContinuous()
+        self.ackNow = False
+        self.ackDue = None
+        return sent
+
+    def transmit(self):
+        # send the slots in self.burst, the last one polls the peer
+        payloads = []
+        for i, slot in enumerate(self.burst):
+            seq = (self.base + (slot - self.base) % MAX_WINDOW) & 0xFF
+            kind = DATA | (POLL if i == len(self.burst) - 1 else 0)
+            self.header(self.frames[slot], kind, seq)
+            self.transmissions += 1
+            self.order[slot] = self.transmissions
+            if self.tries[slot]:
+                self.retransmitted += 1
+            self.tries[slot] += 1
+            self.resend[slot] = False
+            payloads.append(self.views[slot][: self.lengths[slot]])
+        sent = self.flush(payloads)
+        self.sent += sent
+        now = ticks.now()
+        for slot in self.burst:
+            self.sentAt[slot] = now
+        self.arm(now)
+        return sent
+
+    def fill(self):
+        # move queued data into free slots of the window
+        while self.queue and self.inFlight() < self.window:
+            data = self.queue.pop(0)
+            slot = self.next % MAX_WINDOW
+            self.frames[slot][HEADER : HEADER + len(data)] = data
+            self.lengths[slot] = HEADER + len(data)
+            self.acked[slot] = False
+            self.resend[slot] = False
+            self.tries[slot] = 0
+            self.next = (self.next + 1) & 0xFF
+
+    def header(self, frame, kind, seq):
+        # write kind, seq and the receiver's ack and sack into frame
+        sack = 0
+        for i in range(MAX_WINDOW - 1):
+            seq2 = (self.expected + 1 + i) & 0xFF
+            slot = seq2 % MAX_WINDOW
+            if self.held[slot] is not None and self.heldSeq[slot] == seq2:
+                sack |= 1 << i
+        frame[0] = kind | (self.target << 4)
+        frame[1] = seq
+        frame[2] = self.expected
+        frame[3] = sack >> 8
+        frame[4] = sack & 0xFF
+
+    def handle(self, packet):
+        # one packet from the peer
+        payload = packet.payload
+        if len(payload) < HEADER:
+            self.malformed += 1
+            return
+        self.rssi = packet.rssi
+        self.lqi = packet.lqi
+        now = ticks.now()
+        self.quiet = ticks.add(now, self.turnaround)
+        self.heard = now
+        self.unanswered = 0
+        kind = payload[0]
+        if self.steps is not None:
+            self.follow(kind, packet)
+        self.acknowledged(payload[2], (payload[3] << 8) | payload[4])
+        if kind & DATA:
+            self.accept(payload[1], payload[HEADER:])
+            # more of the burst may follow, wait until it has gone by
+            self.ackDue = ticks.deadline(self.ackDelay)
+        if kind & POLL:
+            self.ackNow = True
+        elif kind & DATA and ticks.diff(self.ackDue, self.quiet) > 0:
+            self.quiet = self.ackDue  # the rest of the burst is still coming
+
+    def accept(self, seq, data):
+        # data of packet `seq`, delivered in order once the gaps before it
+        # are filled
+        ahead = (seq - self.expected) & 0xFF
+        if ahead >= MAX_WINDOW:
+            self.duplicates += 1  # delivered before, its ack got lost
+            return
+        slot = seq % MAX_WINDOW
+        if ahead:
+            if self.held[slot] is not None and self.heldSeq[slot] == seq:
+                self.duplicates += 1
+            else:
+                self.held[slot] = bytes(data)
+                self.heldSeq[slot] = seq
+            return
+        self.received.append(bytes(data))
+        self.expected = (self.expected + 1) & 0xFF
+        slot = self.expected % MAX_WINDOW
+        while self.held[slot] is not None and self.heldSeq[slot] == self.expected:
+            self.received.append(self.held[slot])
+            self.held[slot] = None
+            self.expected = (self.expected + 1) & 0xFF
+            slot = self.expected % MAX_WINDOW
+
+    def acknowledged(self, ack, sack):
+        # the peer's ack and sack, frees slots and measures the round trip
+        inflight = self.inFlight()
+        if (ack - self.base) & 0xFF > inflight:
+            return  # older than what has been acknowledged already
+        now = ticks.now()
+        latest = None  # newly acknowledged slot sent last
+        for i in range(inflight):
+            seq = (self.base + i) & 0xFF
+            slot = seq % MAX_WINDOW
+            if self.acked[slot]:
+                continue
+            ahead = (seq - ack) & 0xFF
+            if ((seq - self.base) & 0xFF) < ((ack - self.base) & 0xFF) or (
+                1 <= ahead < MAX_WINDOW and sack & (1 << (ahead - 1))
+            ):
+                self.acked[slot] = True
+                self.resend[slot] = False
+                if latest is None or self.order[slot] > self.order[latest]:
+                    latest = slot
+        if latest is not None and self.order[latest] > self.delivered:
+            self.delivered = self.order[latest]
+            # the acknowledgement answers the burst with this packet, unless
+            # it was a retransmission and may answer an earlier copy
+            if self.tries[latest] == 1:
+                self.measure(ticks.diff(now, self.sentAt[latest]))
+        advanced = False
+        while self.base != self.next and self.acked[self.base % MAX_WINDOW]:
+            self.base = (self.base + 1) & 0xFF
+            advanced = True
+        # a packet sent before one that arrived is lost
+        for i in range(self.inFlight()):
+            slot = (self.base + i) % MAX_WINDOW
+            if (
+                self.tries[slot]
+                and not self.acked[slot]
+                and self.order[slot] < self.delivered
+            ):
+                self.resend[slot] = True
+        if self.base == self.next:
+            self.deadline = None
+        elif advanced:
+            self.arm(now)
+
+    def arm(self, now):
+        # start the retransmission timer, rto plus 0 .. rto / 4 at random
+        self.deadline = ticks.add(
+            now, self.rto + (self.rto >> 10) * self.rng.getrandbits(8)
+        )
+
+    def follow(self, kind, packet):
+        # the step the peer asks for in `kind`
+        want = kind >> 4
+        if self.control is None:
+            if want != self.target and want < len(self.steps):
+                self.target = want  # echoed in the next answer, then used
+            return
+        self.control.record(self.peer, packet.rssi, packet.lqi)
+        if want == self.target != self.step:
+            self.echoed = True
+            if kind & POLL or not kind & DATA:
+                # the end of the peer's transmission, it is on the new step
+                self.switch(self.target)
+
+    def switch(self, step):
+        # move the listening radio to another step
+        radio = self.radio
+        radio.stopContinuous()
+        try:
+            self.use(step)
+        finally:
+            radio.startContinuous()
+
+    def use(self, step):
+        # set up the (idle) radio for steps[step], the round trip times
+        # measured before no longer apply
+        if self.steps is not None:
+            if step != self.step:
+                self.switches += 1
+            self.steps[step].apply(self.radio)
+            self.srtt = None
+            self.rto = INITIAL_RTO
+        self.step = step
+        self.target = step
+        self.echoed = False
+        # delayed acknowledgements wait for about two packets to go by
+        self.ackDelay = 2 * self.radio.airTime(MAX_LENGTH + 1 + PACKET_OVERHEAD)
+
+    def measure(self, rtt):
+        # update the smoothed round trip time and the timeout, us
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt // 2
+        else:
+            self.rttvar += (abs(self.srtt - rtt) - self.rttvar) // 4
+            self.srtt += (rtt - self.srtt) // 8
+        self.rto = min(max(self.srtt + 4 * self.rttvar, MIN_RTO), MAX_RTO)
+
+    def expire(self):
+        # nothing acknowledged for a timeout: send the oldest packet again and
+        # back off. Often only the acknowledgement was lost, the one it polls
+        # for tells which of the others are missing.
+        self.timeouts += 1
+        if self.target != self.step and self.control is not None:
+            # the request or the answer was lost. Every second timeout try
+            # the new step, the peer may have answered and moved.
+            self.unanswered += 1
+            if not self.unanswered % 2:
+                self.switch(self.target)
+        self.rto = min(2 * self.rto, MAX_RTO)
+        if self.inFlight():
+            self.resend[self.base % MAX_WINDOW] = True
+        self.deadline = None
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "retransmitted": self.retransmitted,
+            "timeouts": self.timeouts,
+            "acks": self.acks,
+            "duplicates": self.duplicates,
+            "malformed": self.malformed,
+            "rto": self.rto,
+            "srtt": self.srtt,
+            "ring": (self.ring.dropped, self.ring.rejected, self.ring.overflows),
+            "step": self.step,
+            "switches": self.switches,
+        }
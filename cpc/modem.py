@@ -0,0 +1,150 @@
+import math
+
+import registers as regs
+
+# Modem register solver: data rate (MDMCFG4 DRATE_E / MDMCFG3 DRATE_M),
+# channel filter bandwidth (MDMCFG4 CHANBW_E / CHANBW_M) and frequency
+# deviation (DEVIATN) from the values in Hz, following the formulas of the
+# CC1101 datasheet:
+#
+#   data rate = (256 + DRATE_M) * 2^DRATE_E / 2^28 * f_xosc
+#   bandwidth = f_xosc / (8 * (4 + CHANBW_M) * 2^CHANBW_E)
+#   deviation = f_xosc / 2^17 * (8 + DEVIATION_M) * 2^DEVIATION_E
+
+XOSC = 26000000
+MIN_DATARATE = 600  # baud, datasheet range, 500 kBaud only for 2-FSK / MSK
+MAX_DATARATE = 500000
+
+CACHE = {}  # solveModem() results by (datarate, bandwidth, deviation, xosc)
+CACHE_SIZE = 16  # settings kept, CACHE starts over when full
+
+# typical sensitivity in dBm by data rate at 433 MHz (datasheet, 2-FSK / GFSK
+# at 1 % packet error rate), OOK needs a few dB more
+SENSITIVITY = ((1200, -112), (38400, -104), (250000, -95))
+
+
+def dataRate(mdmcfg4, mdmcfg3, xosc=XOSC):
+    return (256 + mdmcfg3) * pow(2, (mdmcfg4 & 0x0F) - 28) * xosc
+
+
+def bandwidth(mdmcfg4, xosc=XOSC):
+    exponent = mdmcfg4 >> 6
+    mantissa = (mdmcfg4 >> 4) & 0x03
+    return xosc / (8 * (4 + mantissa) * pow(2, exponent))
+
+
+def deviation(deviatn, xosc=XOSC):
+    exponent = (deviatn >> 4) & 0x07
+    mantissa = deviatn & 0x07
+    return xosc / pow(2, 17) * (8 + mantissa) * pow(2, exponent)
+
+
+def defaultBandwidth(datarate, dev=None):
+    # channel filter bandwidth in Hz for a data rate when none is given: the
+    # data rate plus twice the deviation (Carson's rule), or three times the
+    # data rate without one, which also suits ASK / OOK. solveBandwidth()
+    # rounds it up to a filter, at least the narrowest one.
+    if dev is None:
+        return 3 * datarate
+    return datarate + 2 * dev
+
+
+def sensitivity(datarate):
+    # dBm, interpolated between the SENSITIVITY points on a log scale
+    low = SENSITIVITY[0]
+    if datarate <= low[0]:
+        return low[1]
+    for high in SENSITIVITY[1:]:
+        if datarate <= high[0]:
+            share = math.log(datarate / low[0]) / math.log(high[0] / low[0])
+            return low[1] + share * (high[1] - low[1])
+        low = high
+    return low[1]
+
+
+def solveDataRate(rate, xosc=XOSC):
+    # (DRATE_E, DRATE_M) closest to `rate` baud, ValueError outside the
+    # datasheet range
+    if not MIN_DATARATE <= rate <= MAX_DATARATE:
+        raise ValueError(
+            "data rate %r outside %d .. %d baud" % (rate, MIN_DATARATE, MAX_DATARATE)
+        )
+    exponent = int(math.floor(math.log(rate * pow(2, 20) / xosc, 2)))
+    exponent = max(0, min(15, exponent))
+    mantissa = int(round(rate * pow(2, 28) / (xosc * pow(2, exponent)) - 256))
+    if mantissa > 255 and exponent < 15:
+        exponent += 1
+        mantissa = 0
+    return exponent, max(0, min(255, mantissa))
+
+
+def solveBandwidth(width, xosc=XOSC):
+    # (CHANBW_E, CHANBW_M) of the narrowest filter at least `width` Hz wide,
+    # or the widest one there is
+    best = (0, 0)
+    for exponent in range(4):
+        for mantissa in range(4):
+            actual = xosc / (8 * (4 + mantissa) * pow(2, exponent))
+            if actual >= width and actual < bandwidth(best[0] << 6 | best[1] << 4):
+                best = (exponent, mantissa)
+    return best
+
+
+def solveDeviation(width, xosc=XOSC):
+    # (DEVIATION_E, DEVIATION_M) closest to `width` Hz
+    best = None
+    for exponent in range(8):
+        for mantissa in range(8):
+            error = abs(xosc / pow(2, 17) * (8 + mantissa) * pow(2, exponent) - width)
+            if best is None or error < best[0]:
+                best = (error, exponent, mantissa)
+    return best[1], best[2]
+
+
+class ModemConfig:
+    # solved register fields for one modem setting, None for the parts that
+    # were not asked for and stay as configured
+    def __init__(self, datarate, width=None, dev=None, xosc=XOSC):
+        self.drate_e, self.drate_m = solveDataRate(datarate, xosc)
+        self.datarate = dataRate(self.drate_e, self.drate_m, xosc)
+        self.datarate_error = (self.datarate - datarate) / datarate
+
+        self.chanbw = None
+        self.bandwidth = None
+        if width is not None:
+            exponent, mantissa = solveBandwidth(width, xosc)
+            self.chanbw = (exponent << 2) | mantissa
+            self.bandwidth = bandwidth(self.chanbw << 4, xosc)
+
+        self.deviatn = None
+        self.deviation = None
+        self.deviation_error = None
+        if dev is not None:
+            exponent, mantissa = solveDeviation(dev, xosc)
+            self.deviatn = (exponent << 4) | mantissa
+            self.deviation = deviation(self.deviatn, xosc)
+            self.deviation_error = (self.deviation - dev) / dev if dev else 0.0
+
+    def apply(self, image):
+        # write the solved fields into a register image (bytearray)
+        mdmcfg4 = (image[regs.MDMCFG4] & 0xF0) | self.drate_e
+        if self.chanbw is not None:
+            mdmcfg4 = (self.chanbw << 4) | self.drate_e
+        image[regs.MDMCFG4] = mdmcfg4
+        image[regs.MDMCFG3] = self.drate_m
+        if self.deviatn is not None:
+            image[regs.DEVIATN] = self.deviatn
+        return image
+
+
+def solveModem(datarate, width=None, dev=None, xosc=XOSC):
+    # ModemConfig for a data rate in baud and optionally a channel filter
+    # bandwidth and deviation in Hz, solved once and then served from CACHE
+    key = (datarate, width, dev, xosc)
+    config = CACHE.get(key)
+    if config is None:
+        config = ModemConfig(datarate, width, dev, xosc)
+        if len(CACHE) >= CACHE_SIZE:
+            CACHE.clear()  # a sweep over many rates must not fill the heap
+        CACHE[key] = config
+    return config
@@ -0,0 +1,164 @@
+import registers as regs
+
+# Packet mode: the CC1101's packet handler frames and checks the packets
+# instead of the host. With variable length packets the first byte in the
+# FIFO is the length of what follows (address byte included), the radio adds
+# preamble, sync word and CRC on TX, and on RX it drops packets with a foreign
+# address or, with CRC_AUTOFLUSH, a bad CRC before they are read over SPI.
+# APPEND_STATUS adds two bytes after every received packet:
+#
+#   length | [address] | payload | RSSI | CRC_OK << 7 | LQI
+
+FIFO_SIZE = 64
+MAX_LENGTH = FIFO_SIZE - 3  # length byte and the two status bytes must fit
+
+PKTCTRL1_APPEND_STATUS = 0x04
+PKTCTRL1_CRC_AUTOFLUSH = 0x08
+PKTCTRL0_CRC_EN = 0x04
+PKTCTRL0_VARIABLE_LENGTH = 0x01
+
+RSSI_OFFSET = 74  # dB, datasheet table for 433 MHz at 250 kBaud and below
+
+
+def rssiDbm(value):
+    # RSSI register or appended status byte to dBm
+    if value >= 128:
+        value -= 256
+    return value // 2 - RSSI_OFFSET
+
+
+def buildPacket(frame, payload, address=None):
+    # length byte, optional address and payload at the start of frame,
+    # returns the number of bytes to write to the TX FIFO
+    offset = 1 if address is None else 2
+    length = len(payload) + offset - 1
+    assert length <= MAX_LENGTH
+    frame[0] = length
+    if address is not None:
+        frame[1] = address
+    frame[offset : offset + len(payload)] = payload
+    return length + 1
+
+
+class PacketConfig:
+    # packet handler settings applied on top of the RX and TX images.
+    # address=None accepts every packet, otherwise only packets to `address`
+    # and, with broadcast=True, to 0x00.
+    def __init__(self, address=None, broadcast=True, crc=True, autoflush=True):
+        self.address = address
+        self.broadcast = broadcast
+        self.crc = crc
+        self.autoflush = autoflush and crc
+
+    @classmethod
+    def fromImage(cls, image):
+        # the PacketConfig a register image was set up with, None unless it
+        # is in the variable length mode with status bytes apply() sets
+        pktctrl1 = image[regs.PKTCTRL1]
+        pktctrl0 = image[regs.PKTCTRL0]
+        if pktctrl0 & 0x03 != PKTCTRL0_VARIABLE_LENGTH or not (
+            pktctrl1 & PKTCTRL1_APPEND_STATUS
+        ):
+            return None
+        check = pktctrl1 & 0x03
+        return cls(
+            image[regs.ADDR] if check else None,
+            check != 0x01,
+            bool(pktctrl0 & PKTCTRL0_CRC_EN),
+            bool(pktctrl1 & PKTCTRL1_CRC_AUTOFLUSH),
+        )
+
+    def addressed(self):
+        return self.address is not None
+
+    def apply(self, image):
+        # write the packet handler registers into a register image (bytearray)
+        pktctrl1 = (image[regs.PKTCTRL1] & 0xF0) | PKTCTRL1_APPEND_STATUS
+        if self.autoflush:
+            pktctrl1 |= PKTCTRL1_CRC_AUTOFLUSH
+        if self.address is not None:
+            pktctrl1 |= 0x02 if self.broadcast else 0x01  # ADR_CHK
+        pktctrl0 = (image[regs.PKTCTRL0] & 0xF8) | PKTCTRL0_VARIABLE_LENGTH
+        if self.crc:
+            pktctrl0 |= PKTCTRL0_CRC_EN
+        if image[regs.MDMCFG2] & 0x07 == 0:
+            # the raw TX image sends preamble and sync word itself, here the
+            # radio has to, 16 of 16 sync word bits as on RX
+            image[regs.MDMCFG2] |= 0x02
+        image[regs.PKTLEN] = MAX_LENGTH
+        image[regs.PKTCTRL1] = pktctrl1
+        image[regs.PKTCTRL0] = pktctrl0
+        image[regs.ADDR] = self.address if self.address is not None else 0
+        return image
+
+
+class Packet:
+    # one received packet, decoded in place so the object and its buffer can
+    # be reused for every packet. payload is a memoryview of buffer.
+    __slots__ = ("buffer", "view", "payload", "address", "rssi", "lqi", "crc_ok")
+
+    def __init__(self):
+        self.buffer = bytearray(FIFO_SIZE)
+        self.view = memoryview(self.buffer)
+        self.payload = self.view[0:0]
+        self.address = None
+        self.rssi = 0  # dBm
+        self.lqi = 0
+        self.crc_ok = False
+
+    def decode(self, count, addressed):
+        # decode the `count` bytes read from the RX FIFO, False unless they
+        # hold exactly one packet with its status bytes
+        length = self.buffer[0]
+        if length + 3 != count or (addressed and length == 0):
+            return False
+        start = 2 if addressed else 1
+        self.address = self.buffer[1] if addressed else None
+        self.payload = self.view[start : length + 1]
+        self.rssi = rssiDbm(self.buffer[length + 1])
+        status = self.buffer[length + 2]
+        self.lqi = status & 0x7F
+        self.crc_ok = bool(status & 0x80)
+        return True
+
+
+class PacketRing:
+    # fixed number of preallocated Packet slots, filled by CC1101.drain() and
+    # emptied oldest first by get(). A packet from get() stays valid until
+    # the ring wraps around to its slot again.
+    def __init__(self, slots):
+        self.slots = [Packet() for _ in range(slots)]
+        self.spare = Packet()  # receives packets while the ring is full
+        self.head = 0  # next slot to fill
+        self.tail = 0  # oldest filled slot
+        self.count = 0
+        self.dropped = 0  # packets lost because the ring was full
+        self.rejected = 0  # packets with a bad CRC
+        self.overflows = 0  # RX FIFO overflows, packets in the FIFO lost
+
+    def __len__(self):
+        return self.count
+
+    def slot(self):
+        # the Packet the next received packet is read into
+        if self.count == len(self.slots):
+            return self.spare
+        return self.slots[self.head]
+
+    def push(self, packet):
+        # keep `packet`, which came from slot(), False if it was dropped
+        if packet is self.spare:
+            self.dropped += 1
+            return False
+        self.head = (self.head + 1) % len(self.slots)
+        self.count += 1
+        return True
+
+    def get(self):
+        # oldest packet, None if the ring is empty
+        if not self.count:
+            return None
+        packet = self.slots[self.tail]
+        self.tail = (self.tail + 1) % len(self.slots)
+        self.count -= 1
+        return packet
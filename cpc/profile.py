@@ -0,0 +1,142 @@
+import registers as regs
+from cpc import modem
+from cpc.packet import PacketConfig
+
+# Register profiles: complete 0x00 - 0x2E register images, compiled once into
+# 47 bytes so that switching to a profile is CC1101.loadProfile(), a single
+# burst write (or with partial=True only the runs that differ).
+#
+# Images are compiled from a dict of register names or addresses to values,
+# or from a SmartRF Studio register export. Any export template that puts the
+# register name and its value on one line works, e.g.
+#
+#   IOCFG0     0x06        (name, value)
+#   FSCTRL1    0x0B 0x06   (name, address, value)
+#   0x000B 0x06 FSCTRL1    (address, value, name)
+#   #define SMARTRF_SETTING_IOCFG0 0x06
+#   {CC1101_IOCFG0, 0x06},
+#
+# ProfileCache builds the images of operating points (frequency, data rate,
+# modulation, packet mode) on top of the driver's RX and TX images and keeps
+# them, so they are only computed the first time:
+#
+#     profiles = ProfileCache("666A")
+#     rx = profiles.get(433920000, 4000, profile.MOD_ASK)
+#     radio.loadProfile(rx)
+#
+# compileProfile() needs nothing of the driver, so standalone scripts can
+# import this module without cpc.cpc, which the other helpers import when
+# they are called.
+
+# configuration register names in address order
+CONFIG_NAMES = (
+    "IOCFG2", "IOCFG1", "IOCFG0", "FIFOTHR", "SYNC1", "SYNC0", "PKTLEN",
+    "PKTCTRL1", "PKTCTRL0", "ADDR", "CHANNR", "FSCTRL1", "FSCTRL0", "FREQ2",
+    "FREQ1", "FREQ0", "MDMCFG4", "MDMCFG3", "MDMCFG2", "MDMCFG1", "MDMCFG0",
+    "DEVIATN", "MCSM2", "MCSM1", "MCSM0", "FOCCFG", "BSCFG", "AGCCTRL2",
+    "AGCCTRL1", "AGCCTRL0", "WOREVT1", "WOREVT0", "WORCTRL", "FREND1",
+    "FREND0", "FSCAL3", "FSCAL2", "FSCAL1", "FSCAL0", "RCCTRL1", "RCCTRL0",
+    "FSTEST", "PTEST", "AGCTEST", "TEST2", "TEST1", "TEST0",
+)  # fmt: skip
+ADDRESSES = {name: address for address, name in enumerate(CONFIG_NAMES)}
+assert len(CONFIG_NAMES) == regs.CONFIG_LENGTH
+
+# MDMCFG2 MOD_FORMAT
+MOD_2FSK = 0x00
+MOD_GFSK = 0x10
+MOD_ASK = 0x30  # ASK / OOK
+MOD_4FSK = 0x40
+MOD_MSK = 0x70
+
+
+def parseSmartRF(text):
+    # {address: value} of the configuration registers in a SmartRF Studio
+    # export, lines without one are skipped (CPython)
+    import re
+
+    name = re.compile(r"\b(?:\w*_)?([A-Z][A-Z0-9]+)\b")
+    hexadecimal = re.compile(r"\b0x([0-9A-Fa-f]{1,4})\b")
+    settings = {}
+    for line in text.splitlines():
+        for match in name.finditer(line):
+            address = ADDRESSES.get(match.group(1))
+            if address is not None:
+                break
+        else:
+            continue
+        values = hexadecimal.findall(line, match.end()) or hexadecimal.findall(line)
+        if not values:
+            continue
+        values = [int(value, 16) for value in values]
+        if len(values) > 1 and values[0] == address:
+            values = values[1:]  # address, value
+        settings[address] = values[0] & 0xFF
+    return settings
+
+
+def compileProfile(settings, base=regs.RESET_CONFIG):
+    # 47 byte image of `base` with `settings` applied: a dict of register
+    # names or addresses to values, or the text of a SmartRF Studio export
+    if isinstance(settings, str):
+        settings = parseSmartRF(settings)
+    image = bytearray(base)
+    assert len(image) == regs.CONFIG_LENGTH
+    for register, value in settings.items():
+        address = ADDRESSES[register] if isinstance(register, str) else register
+        assert 0 <= address < regs.CONFIG_LENGTH and 0 <= value <= 0xFF
+        image[address] = value
+    return bytes(image)
+
+
+def diffProfiles(old, new, gap=None):
+    # [(address, bytes)] bursts that turn registers holding `old` into `new`,
+    # the calibration results in FSCAL3 - FSCAL1 left as they are
+    from cpc.cpc import CONFIG_GAP, dirtyRuns
+
+    if gap is None:
+        gap = CONFIG_GAP
+    dirty = bytearray(regs.CONFIG_LENGTH)
+    for address in range(regs.CONFIG_LENGTH):
+        if old[address] != new[address] and address not in regs.VOLATILE_CONFIG:
+            dirty[address] = 1
+    return [(start, new[start:end]) for start, end in dirtyRuns(dirty, gap)]
+
+
+class ProfileCache:
+    # compiled images by (frequency, data rate, modulation, packet, tx).
+    # packet is None for raw frames, True for packet mode and an address for
+    # packet mode with the address filter (broadcasts accepted).
+    def __init__(self, syncword, xosc=modem.XOSC):
+        from cpc.cpc import parseSyncword
+
+        self.syncword = parseSyncword(syncword)
+        self.xosc = xosc
+        self.images = {}
+
+    def __len__(self):
+        return len(self.images)
+
+    def add(self, key, settings, base=regs.RESET_CONFIG):
+        # keep a profile compiled from a dict or SmartRF export under `key`
+        image = compileProfile(settings, base)
+        self.images[key] = image
+        return image
+
+    def get(self, frequency, datarate, modulation=MOD_ASK, packet=None, tx=False):
+        key = (frequency, datarate, modulation, packet, tx)
+        image = self.images.get(key)
+        if image is None:
+            from cpc.cpc import frequencyWord
+
+            image = bytearray(regs.TX_CONFIG if tx else regs.RX_CONFIG)
+            image[regs.FREQ2 : regs.FREQ0 + 1] = frequencyWord(frequency)
+            image[regs.SYNC1 : regs.SYNC0 + 1] = self.syncword
+            width = modem.defaultBandwidth(datarate)
+            modem.solveModem(datarate, width, xosc=self.xosc).apply(image)
+            image[regs.MDMCFG2] = (image[regs.MDMCFG2] & 0x8F) | modulation
+            if packet is not None:
+                address = None if packet is True else packet
+                PacketConfig(address).apply(image)
+            image = bytes(image)
+            self.images[key] = image
+        return image
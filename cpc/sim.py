@@ -0,0 +1,766 @@
+import random
+import threading
+import time
+
+import registers as regs
+from cpc import modem
+
+# A simulated CC1101 for running and benchmarking the driver without hardware.
+#
+# SimulatedCC1101 takes the place of the SPIDevice of a CC1101 object: it is
+# used as `with device as spi:` and decodes the bytes clocked through write(),
+# readinto() and write_readinto() like the chip does (header byte, single and
+# burst access, strobes, status byte on MISO). It models the configuration
+# registers, the 64 byte TX and RX FIFOs, the MARCSTATE state machine, the
+# packet handler (sync word, fixed / variable / infinite length, address check,
+# CRC, appended status) and the GDO0 output, and counts SPI transactions and
+# bytes so the driver's bus traffic can be measured.
+#
+# Air time follows the configured data rate on a real clock (time.monotonic by
+# default), so the driver's own sleeps and polling loops behave as on the
+# board. Leaving IDLE takes as long as on the chip too: CALIBRATE for the
+# FS_AUTOCAL calibration, then SETTLING, and strobes other than SIDLE are
+# ignored until the radio gets to RX, TX or FSTXON. Radios sharing a SimulatedAir hear each other when they are tuned to
+# the same FREQ2/FREQ1/FREQ0/CHANNR, inject() puts a transmission on the air
+# from outside. A receiver misses transmissions at a data rate other than its
+# own and those weaker than modem.sensitivity() for its rate. The level a
+# radio is received with follows its PATABLE output power.
+#
+#     sim = SimulatedCC1101()
+#     radio = CC1101(None, None, sim.gdo0, 50000, 434400000, "666A", device=sim)
+
+XOSC = 26000000
+
+IDLE = 0x01
+FSTXON = 0x12
+RX = 0x0D
+TX = 0x13
+RXFIFO_OVERFLOW = 0x11
+TXFIFO_UNDERFLOW = 0x16
+STARTCAL = 0x08
+FS_LOCK = 0x0A
+
+CALIBRATION_TIME = 721e-6  # s, FS_AUTOCAL calibration from IDLE
+SETTLE_TIME = 88.4e-6  # s, IDLE to RX / TX / FSTXON without calibration
+
+# MARCSTATE to the state field (bits 6:4) of the chip status byte
+STATUS_STATE = {
+    IDLE: 0,
+    RX: 1,
+    TX: 2,
+    FSTXON: 3,
+    STARTCAL: 4,  # CALIBRATE
+    FS_LOCK: 5,  # SETTLING
+    RXFIFO_OVERFLOW: 6,
+    TXFIFO_UNDERFLOW: 7,
+}
+
+PREAMBLE_BYTES = (2, 3, 4, 6, 8, 12, 16, 24)  # MDMCFG1 NUM_PREAMBLE
+
+PA_DBM = {value: dbm for dbm, value in regs.PA_LEVELS.items()}
+FULL_POWER = 10  # dBm, PATABLE 0xC0
+RATE_TOLERANCE = 0.05  # data rate offset a receiver still locks on to
+
+
+def crc16(crc, byte):
+    # CRC-16 of the CC1101 packet handler, polynomial 0x8005, initial 0xFFFF
+    for _ in range(8):
+        if ((crc >> 15) ^ (byte >> 7)) & 1:
+            crc = ((crc << 1) ^ 0x8005) & 0xFFFF
+        else:
+            crc = (crc << 1) & 0xFFFF
+        byte = (byte << 1) & 0xFF
+    return crc
+
+
+def popcount(value):
+    count = 0
+    while value:
+        value &= value - 1
+        count += 1
+    return count
+
+
+class Frame:
+    # one transmission on the air, growing while the sender is transmitting
+    def __init__(self, start, byte_time, channel, rssi, source=None):
+        self.source = source  # transmitting SimulatedCC1101, None for inject()
+        self.start = start
+        self.byte_time = byte_time
+        self.channel = channel
+        self.rssi = rssi
+        self.data = bytearray()
+        self.done = False
+
+    def due(self, index):
+        # time byte `index` has completely arrived at a receiver
+        return self.start + (index + 1) * self.byte_time
+
+    def end(self):
+        return self.due(len(self.data) - 1)
+
+
+class SimulatedAir:
+    # loss: probability that a receiver misses a transmission entirely
+    def __init__(self, loss=0.0, seed=None):
+        self.radios = []
+        self.loss = loss
+        self.random = random.Random(seed)
+        # steady signals in dBm, e.g. a jammer, keyed like Frame.channel by the
+        # FREQ2, FREQ1, FREQ0, CHANNR bytes
+        self.carriers = {}
+
+    def transmit(self, sender, frame):
+        for radio in self.radios:
+            if radio is not sender:
+                if self.loss and self.random.random() < self.loss:
+                    continue
+                radio.inbox.append(frame)
+
+    def busy(self, channel, now):
+        # a transmission is currently on the air on `channel`
+        for radio in self.radios:
+            frame = radio.txframe
+            if radio.state == TX and frame is not None and frame.channel == channel:
+                if frame.start <= now:
+                    return True
+        return False
+
+
+class SimulatedPin:
+    # DigitalInOut-like view of the GDO0 output
+    def __init__(self, sim):
+        self.sim = sim
+
+    @property
+    def value(self):
+        self.sim.update()
+        return self.sim.gdo0Value()
+
+
+class SimulatedCC1101:
+    def __init__(self, air=None, clock=None, rssi=-60, noise=-100):
+        self.air = air if air is not None else SimulatedAir()
+        self.air.radios.append(self)
+        self.clock = clock if clock is not None else time.monotonic
+        self.rssi = rssi  # dBm others receive this radio with at full power
+        self.noise = noise  # dBm reported while nothing is received
+        self.gdo0 = SimulatedPin(self)
+
+        self.transactions = 0  # chip select cycles
+        self.bytes = 0  # bytes clocked over SPI
+        self.calibrations = 0
+
+        self.inbox = []  # frames on the air heading for this radio
+        self.sensed = []  # frames it cannot receive but still senses
+        self.lock = threading.RLock()  # radios may be driven from several threads
+        self.reset()
+
+    def reset(self):
+        self.registers = bytearray(regs.RESET_CONFIG)
+        self.patable = bytearray(8)
+        self.txfifo = bytearray()
+        self.rxfifo = bytearray()
+        self.state = IDLE
+        self.target = None  # state at the end of CALIBRATE / SETTLING
+        self.due = 0.0  # when the radio gets there
+        self.txframe = None
+        self.rxstart = 0.0
+        self.rxpos = 0  # next byte of inbox[0]
+        self.huntReset()
+        self.crcok = False  # GDO0 0x07, CRC OK packet in the RX FIFO
+        self.rxend = False  # GDO0 0x01, end of packet reached
+        self.lqi = 0x7F
+        self.rssiValue = self.noise
+        self.access = None  # SPI decoder state inside a transaction
+
+    # SPIDevice interface
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.transactions += 1
+        self.access = None
+        self.update()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.access = None
+        self.lock.release()
+        return False
+
+    def write(self, buffer, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        for i in range(start, end):
+            self.exchange(buffer[i])
+
+    def readinto(self, buffer, start=0, end=None, write_value=0):
+        if end is None:
+            end = len(buffer)
+        for i in range(start, end):
+            buffer[i] = self.exchange(write_value)
+
+    def write_readinto(
+        self,
+        buffer_out,
+        buffer_in,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None,
+    ):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        assert out_end - out_start == in_end - in_start
+        for i in range(out_end - out_start):
+            buffer_in[in_start + i] = self.exchange(buffer_out[out_start + i])
+
+    # SPI byte decoder
+
+    def statusByte(self, read):
+        if read:
+            available = len(self.rxfifo)
+        else:
+            available = 64 - len(self.txfifo)
+        state = STATUS_STATE.get(self.state, 0)
+        return (state << 4) | min(available, 15)
+
+    def exchange(self, byte):
+        self.bytes += 1
+        if self.access is None:  # header byte
+            read = bool(byte & regs.READ_SINGLE_BYTE)
+            burst = bool(byte & regs.WRITE_BURST)
+            address = byte & 0x3F
+            status = self.statusByte(read)
+            if 0x30 <= address <= 0x3D and not burst:
+                self.command(address)
+            else:
+                self.access = [address, read, burst]
+            return status
+
+        address, read, burst = self.access
+        if read:
+            value = self.readRegister(address, burst)
+        else:
+            value = self.statusByte(False)
+            self.writeRegister(address, byte)
+        if not burst:
+            self.access = None
+        elif address < regs.CONFIG_LENGTH:
+            self.access[0] = address + 1
+        return value
+
+    def readRegister(self, address, burst):
+        if address == regs.RXFIFO:
+            self.update()
+            value = self.rxfifo.pop(0) if self.rxfifo else 0
+            self.crcok = False
+            if not self.rxfifo:
+                self.rxend = False
+            return value
+        if address == regs.PATABLE:
+            return self.patable[0]
+        if address >= 0x30:
+            if burst:
+                return self.readStatus(address)
+            return 0
+        if address < regs.CONFIG_LENGTH:
+            return self.registers[address]
+        return 0
+
+    def readStatus(self, address):
+        self.update()
+        if address == regs.PARTNUM & 0x3F:
+            return 0x00
+        if address == regs.VERSION & 0x3F:
+            return 0x14
+        if address == regs.LQI & 0x3F:
+            return self.lqi
+        if address == regs.RSSI & 0x3F:
+            level = self.rssiValue
+            if self.state == RX and level == self.noise:
+                level = self.air.carriers.get(self.channel(), self.noise)
+            return encodeRssi(level)
+        if address == regs.MARCSTATE & 0x3F:
+            return self.state
+        if address == regs.PKTSTATUS & 0x3F:
+            return (0x10 if self.channelClear() else 0) | int(self.gdo0Value())
+        if address == regs.TXBYTES & 0x3F:
+            underflow = 0x80 if self.state == TXFIFO_UNDERFLOW else 0
+            return underflow | len(self.txfifo)
+        if address == regs.RXBYTES & 0x3F:
+            overflow = 0x80 if self.state == RXFIFO_OVERFLOW else 0
+            return overflow | len(self.rxfifo)
+        if address == regs.RCCTRL1_STATUS & 0x3F:
+            return self.registers[regs.RCCTRL1]
+        if address == regs.RCCTRL0_STATUS & 0x3F:
+            return self.registers[regs.RCCTRL0]
+        return 0
+
+    def writeRegister(self, address, value):
+        if address == regs.TXFIFO:
+            self.update()
+            if len(self.txfifo) < 64:
+                self.txfifo.append(value)
+            else:
+                self.state = TXFIFO_UNDERFLOW  # the chip flags overflow the same way
+            return
+        if address == regs.PATABLE:
+            self.patable = self.patable[1:] + bytes([value])
+            return
+        if address < regs.CONFIG_LENGTH:
+            self.registers[address] = value
+
+    def command(self, strobe):
+        self.update()
+        now = self.clock()
+        if strobe == regs.SRES:
+            self.reset()
+        elif strobe == regs.SIDLE or strobe in (regs.SXOFF, regs.SPWD):
+            self.enterIdle()
+        elif strobe == regs.SCAL:
+            if self.state == IDLE:
+                self.calibrate()
+        elif strobe == regs.SFSTXON:
+            if self.state == IDLE:
+                self.wakeUp(FSTXON, now)
+        elif strobe == regs.SRX:
+            if self.state == IDLE:
+                self.wakeUp(RX, now)
+            elif self.state in (FSTXON, TX):
+                self.enterRx(now)
+        elif strobe == regs.STX:
+            if self.state == RX and self.registers[regs.MCSM1] & 0x30:
+                if not self.channelClear():
+                    return  # CCA: stay in RX
+            if self.state == IDLE:
+                self.wakeUp(TX, now)
+            elif self.state in (FSTXON, RX):
+                self.enterTx(now)
+        elif strobe == regs.SFRX:
+            if self.state in (IDLE, RXFIFO_OVERFLOW):
+                self.rxfifo = bytearray()
+                self.crcok = False
+                self.rxend = False
+                if self.state == RXFIFO_OVERFLOW:
+                    self.state = IDLE
+        elif strobe == regs.SFTX:
+            if self.state in (IDLE, TXFIFO_UNDERFLOW):
+                self.txfifo = bytearray()
+                if self.state == TXFIFO_UNDERFLOW:
+                    self.state = IDLE
+
+    # radio state machine
+
+    def channel(self):
+        return bytes(self.registers[regs.FREQ2 : regs.FREQ0 + 1]) + bytes(
+            [self.registers[regs.CHANNR]]
+        )
+
+    def dataRate(self):
+        mantissa = self.registers[regs.MDMCFG3]
+        exponent = self.registers[regs.MDMCFG4] & 0x0F
+        return (256 + mantissa) * pow(2, exponent) * XOSC / pow(2, 28)
+
+    def power(self):
+        # dBm of the PATABLE entry FREND0 PA_POWER selects
+        value = self.patable[self.registers[regs.FREND0] & 0x07]
+        return PA_DBM.get(value, FULL_POWER)
+
+    def calibrate(self):
+        # results depend on the frequency so cached calibration can be checked
+        freq = self.registers[regs.FREQ2 : regs.FREQ0 + 1]
+        self.registers[regs.FSCAL3] = 0xE9
+        self.registers[regs.FSCAL2] = 0x20 | (freq[0] & 0x1F)
+        self.registers[regs.FSCAL1] = (
+            freq[1] ^ freq[2] ^ self.registers[regs.CHANNR]
+        ) & 0x3F
+        self.calibrations += 1
+
+    def wakeUp(self, target, now):
+        # IDLE to `target` through CALIBRATE (with FS_AUTOCAL from IDLE, the
+        # results are there at once) and SETTLING, finished by settle()
+        self.state = FS_LOCK
+        self.due = now + SETTLE_TIME
+        if (self.registers[regs.MCSM0] >> 4) & 0x03 == 1:  # from IDLE
+            self.calibrate()
+            self.state = STARTCAL
+            self.due += CALIBRATION_TIME
+        self.target = target
+
+    def settle(self, now):
+        if self.state == STARTCAL and now >= self.due - SETTLE_TIME:
+            self.state = FS_LOCK
+        if now < self.due:
+            return
+        target = self.target
+        self.target = None
+        if target == RX:
+            self.enterRx(self.due)
+        elif target == TX:
+            self.enterTx(self.due)
+        else:
+            self.state = target
+
+    def enterIdle(self):
+        if self.state in (RX, TX, FSTXON):
+            if (self.registers[regs.MCSM0] >> 4) & 0x03 == 2:  # back to IDLE
+                self.calibrate()
+        self.endTxFrame()
+        self.state = IDLE
+        self.target = None
+        self.huntReset()
+        self.rssiValue = self.noise
+
+    def enterRx(self, now):
+        self.endTxFrame()
+        self.state = RX
+        self.rxstart = now
+        self.huntReset()
+
+    def enterTx(self, now):
+        self.huntReset()
+        self.state = TX
+        self.txframe = None
+        self.txStart(now)
+
+    def txStart(self, now):
+        self.txframe = Frame(
+            now,
+            8 / self.dataRate(),
+            self.channel(),
+            self.rssi + self.power() - FULL_POWER,
+            source=self,
+        )
+        self.txphase = 0  # 0 preamble, 1 sync, 2 data, 3 crc
+        self.txcount = 0  # bytes sent in the current phase
+        self.txlength = None  # variable length packets: length byte
+        self.txcrc = 0xFFFF
+        self.syncflag = False
+        self.air.transmit(self, self.txframe)
+
+    def endTxFrame(self):
+        if self.txframe is not None:
+            self.txframe.done = True
+            self.txframe = None
+        if self.state == TX:
+            self.syncflag = False
+
+    def afterPacket(self, mode, now):
+        # RXOFF_MODE / TXOFF_MODE: 0 IDLE, 1 FSTXON, 2 TX, 3 RX
+        self.endTxFrame()
+        if mode == 0:
+            self.enterIdle()
+        elif mode == 1:
+            self.state = FSTXON
+        elif mode == 2:
+            self.enterTx(now)
+        else:
+            self.enterRx(now)
+
+    def syncWord(self):
+        mode = self.registers[regs.MDMCFG2] & 0x03
+        word = bytes(self.registers[regs.SYNC1 : regs.SYNC0 + 1])
+        if mode == 0:
+            return b""
+        if mode == 3:
+            return word + word
+        return word
+
+    def lengthConfig(self):
+        return self.registers[regs.PKTCTRL0] & 0x03
+
+    def crcEnabled(self):
+        return bool(self.registers[regs.PKTCTRL0] & 0x04)
+
+    def packetDone(self, count, length):
+        # `count` data bytes (including a length byte) have been handled
+        config = self.lengthConfig()
+        if config == 1:
+            return length is not None and count == length + 1
+        if config == 0:
+            return count & 0xFF == self.registers[regs.PKTLEN]
+        return False
+
+    def pull(self):
+        # bring a transmitting radio up to date for a receiver, skipped while
+        # another thread is using it. Only its transmission, two radios in RX
+        # would otherwise keep pulling each other.
+        if self.lock.acquire(False):
+            try:
+                if self.state == TX:
+                    self.updateTx(self.clock())
+            finally:
+                self.lock.release()
+
+    def update(self):
+        with self.lock:
+            self.advance(self.clock())
+
+    def advance(self, now):
+        if self.target is not None:
+            self.settle(now)
+        if self.state == TX:
+            self.updateTx(now)
+        if self.state == RX:
+            self.updateRx(now)
+        elif self.state != TX:
+            # frames that go by while not listening are lost
+            while self.inbox and self.inbox[0].done and self.inbox[0].end() < now:
+                self.inbox.pop(0)
+                self.rxpos = 0
+
+    def updateTx(self, now):
+        while self.state == TX:
+            frame = self.txframe
+            if frame.due(len(frame.data)) > now:
+                return
+            byte = self.txByte()
+            if byte is None:  # TX FIFO underflow
+                return
+            frame.data.append(byte)
+            if self.txphase == 4:  # packet complete
+                self.syncflag = False
+                self.afterPacket(self.registers[regs.MCSM1] & 0x03, frame.end())
+
+    def txByte(self):
+        # next byte on the air, None on TX FIFO underflow
+        if self.txphase == 0:
+            preamble = PREAMBLE_BYTES[(self.registers[regs.MDMCFG1] >> 4) & 7]
+            if not self.syncWord():
+                preamble = 0  # SYNC_MODE 0: no preamble or sync word
+            if self.txcount < preamble or not self.txfifo:
+                self.txcount += 1
+                return 0xAA  # preamble, continued until there is data
+            self.txphase = 1
+            self.txcount = 0
+        if self.txphase == 1:
+            sync = self.syncWord()
+            if self.txcount < len(sync):
+                self.txcount += 1
+                if self.txcount == len(sync):
+                    self.syncflag = True
+                return sync[self.txcount - 1]
+            self.syncflag = True
+            self.txphase = 2
+            self.txcount = 0
+        if self.txphase == 2:
+            if not self.txfifo:
+                self.state = TXFIFO_UNDERFLOW
+                self.syncflag = False
+                self.txframe.done = True
+                self.txframe = None
+                return None
+            byte = self.txfifo.pop(0)
+            if self.txcount == 0 and self.lengthConfig() == 1:
+                self.txlength = byte
+            self.txcrc = crc16(self.txcrc, byte)
+            self.txcount += 1
+            if self.packetDone(self.txcount, self.txlength):
+                self.txphase = 3 if self.crcEnabled() else 4
+                self.txcount = 0
+            return byte
+        # CRC, high byte first
+        self.txcount += 1
+        if self.txcount == 1:
+            return self.txcrc >> 8
+        self.txphase = 4
+        return self.txcrc & 0xFF
+
+    def huntReset(self):
+        self.window = 0  # last bytes received while hunting for the sync word
+        self.hunting = True
+        self.syncflag = False
+        self.rxcount = 0
+        self.rxlength = None
+        self.rxcrc = 0xFFFF
+        self.rxcrcbytes = None  # received CRC bytes once the data is complete
+        self.packetstart = len(self.rxfifo)
+
+    def updateRx(self, now):
+        while self.state == RX and self.inbox:
+            frame = self.inbox[0]
+            if frame.channel != self.channel():
+                self.inbox.pop(0)
+                self.rxpos = 0
+                continue
+            if self.rxpos == 0 and not self.hears(frame):
+                # too weak or at another data rate, CCA still senses it
+                self.sensed = [f for f in self.sensed if not f.done or f.end() >= now]
+                self.sensed.append(self.inbox.pop(0))
+                continue
+            while self.state == RX:
+                if self.rxpos >= len(frame.data) and frame.source is not None:
+                    frame.source.pull()
+                if self.rxpos >= len(frame.data):
+                    if not frame.done:
+                        return
+                    self.inbox.pop(0)
+                    self.rxpos = 0
+                    self.frameLost()
+                    break
+                if frame.due(self.rxpos) > now:
+                    return
+                byte = frame.data[self.rxpos]
+                if frame.due(self.rxpos) - frame.byte_time >= self.rxstart:
+                    self.rssiValue = frame.rssi
+                    self.rxByte(byte, frame.due(self.rxpos))
+                self.rxpos += 1
+        if self.state == RX and not self.inbox:
+            self.rssiValue = self.noise
+
+    def hears(self, frame):
+        # the frame is at this radio's data rate and strong enough for it
+        rate = self.dataRate()
+        if abs(8 / frame.byte_time - rate) > RATE_TOLERANCE * rate:
+            return False
+        return frame.rssi >= modem.sensitivity(rate)
+
+    def frameLost(self):
+        # the transmission ended in the middle of a packet
+        if not self.hunting:
+            del self.rxfifo[self.packetstart :]
+        self.huntReset()
+        self.rssiValue = self.noise
+
+    def rxByte(self, byte, now):
+        if self.hunting:
+            sync = self.syncWord()
+            if sync:
+                bits = 8 * len(sync)
+                self.window = ((self.window << 8) | byte) & ((1 << bits) - 1)
+                errors = popcount(self.window ^ int.from_bytes(sync, "big"))
+                allowed = {1: 1, 2: 0, 3: 2}[self.registers[regs.MDMCFG2] & 0x03]
+                if errors <= allowed:
+                    self.hunting = False
+                    self.syncflag = True
+                    self.packetstart = len(self.rxfifo)
+                return
+            self.hunting = False
+            self.syncflag = True
+            self.packetstart = len(self.rxfifo)
+
+        if self.rxcrcbytes is not None:  # receiving the CRC
+            self.rxcrcbytes.append(byte)
+            if len(self.rxcrcbytes) == 2:
+                received = int.from_bytes(self.rxcrcbytes, "big")
+                self.rxEnd(received == self.rxcrc, now)
+            return
+
+        if self.rxcount == 0 and self.lengthConfig() == 1:
+            if byte > self.registers[regs.PKTLEN]:
+                self.huntReset()  # longer than allowed, discard
+                return
+            self.rxlength = byte
+        if not self.addressOk(byte):
+            del self.rxfifo[self.packetstart :]
+            self.huntReset()
+            return
+        if len(self.rxfifo) >= 64:
+            self.state = RXFIFO_OVERFLOW
+            self.syncflag = False
+            return
+        self.rxfifo.append(byte)
+        self.rxcrc = crc16(self.rxcrc, byte)
+        self.rxcount += 1
+        if self.packetDone(self.rxcount, self.rxlength):
+            if self.crcEnabled():
+                self.rxcrcbytes = bytearray()
+            else:
+                self.rxEnd(True, now)
+
+    def addressOk(self, byte):
+        check = self.registers[regs.PKTCTRL1] & 0x03
+        position = 1 if self.lengthConfig() == 1 else 0
+        if check == 0 or self.rxcount != position:
+            return True
+        if byte == self.registers[regs.ADDR]:
+            return True
+        return (check >= 2 and byte == 0x00) or (check == 3 and byte == 0xFF)
+
+    def rxEnd(self, crcok, now):
+        pktctrl1 = self.registers[regs.PKTCTRL1]
+        self.lqi = (0x80 if crcok else 0) | 0x10
+        if not crcok and pktctrl1 & 0x08:  # CRC_AUTOFLUSH
+            del self.rxfifo[self.packetstart :]
+        elif pktctrl1 & 0x04:  # APPEND_STATUS
+            for value in (encodeRssi(self.rssiValue), self.lqi):
+                if len(self.rxfifo) < 64:
+                    self.rxfifo.append(value)
+                else:
+                    self.state = RXFIFO_OVERFLOW
+        if self.state == RXFIFO_OVERFLOW:
+            self.syncflag = False
+            return
+        self.crcok = crcok and self.crcEnabled()
+        self.rxend = True
+        self.huntReset()
+        self.afterPacket((self.registers[regs.MCSM1] >> 2) & 0x03, now)
+
+    # outputs
+
+    def channelClear(self):
+        now = self.clock()
+        channel = self.channel()
+        for frame in self.inbox + self.sensed:
+            if frame.channel == channel and frame.start <= now:
+                if not frame.done or frame.end() >= now:
+                    return False
+        return not self.air.busy(channel, now)
+
+    def gdo0Value(self):
+        config = self.registers[regs.IOCFG0]
+        signal = config & 0x3F
+        txthreshold = 61 - 4 * (self.registers[regs.FIFOTHR] & 0x0F)
+        rxthreshold = 4 * ((self.registers[regs.FIFOTHR] & 0x0F) + 1)
+        if signal == 0x00:
+            value = len(self.rxfifo) >= rxthreshold
+        elif signal == 0x01:
+            value = len(self.rxfifo) >= rxthreshold or (
+                self.rxend and len(self.rxfifo) > 0
+            )
+        elif signal == 0x02:
+            value = len(self.txfifo) >= txthreshold
+        elif signal == 0x03:
+            value = len(self.txfifo) >= 64
+        elif signal == 0x04:
+            value = self.state == RXFIFO_OVERFLOW
+        elif signal == 0x05:
+            value = self.state == TXFIFO_UNDERFLOW
+        elif signal == 0x06:
+            value = self.syncflag
+        elif signal == 0x07:
+            value = self.crcok
+        elif signal == 0x09:
+            value = self.channelClear()
+        elif signal == 0x0E:
+            value = self.rssiValue > self.noise
+        else:
+            value = False
+        return value != bool(config & 0x40)
+
+    # test input
+
+    def inject(self, data, delay=0, rssi=None, datarate=None):
+        # put a transmission of the raw bytes `data` (preamble and sync word
+        # included) on the air of this radio, starting after `delay` seconds
+        if datarate is None:
+            datarate = self.dataRate()
+        frame = Frame(
+            self.clock() + delay,
+            8 / datarate,
+            self.channel(),
+            self.rssi if rssi is None else rssi,
+        )
+        frame.data[:] = data
+        frame.done = True
+        self.inbox.append(frame)
+        return frame
+
+
+def encodeRssi(dbm):
+    # RSSI register value for a level in dBm (RSSI_offset 74 dB)
+    value = int((dbm + 74) * 2)
+    return max(-128, min(127, value)) & 0xFF
@@ -0,0 +1,65 @@
+import time
+
+# Clock for the driver's wait loops, in small ints that wrap around at 2**29
+# so that polling it allocates nothing on the heap. time.monotonic_ns() returns
+# a long int on CircuitPython, one heap object per call, and a loop polling it
+# fills the heap and leads to GC pauses.
+#
+# Ticks count microseconds with MicroPython's time.ticks_us(). CircuitPython
+# only has supervisor.ticks_ms(), there a tick is RESOLUTION = 1000 us and a
+# deadline is rounded up to whole milliseconds. Other platforms, CPython with
+# cpc.sim or spidev, count microseconds of time.monotonic_ns(). Delays and
+# timeouts passed in are always in microseconds.
+
+PERIOD = 1 << 29
+MASK = PERIOD - 1
+HALF = PERIOD // 2
+
+try:
+    from time import sleep_us as delay_us
+    from time import ticks_us as clock
+
+    RESOLUTION = 1
+except ImportError:
+    try:
+        from microcontroller import delay_us
+        from supervisor import ticks_ms as clock
+
+        RESOLUTION = 1000
+    except ImportError:
+        RESOLUTION = 1
+
+        def clock():
+            return time.monotonic_ns() // 1000
+
+        def delay_us(delay):
+            due = time.monotonic_ns() + delay * 1000
+            while time.monotonic_ns() < due:
+                pass
+
+
+def now():
+    return clock() & MASK
+
+
+def add(ticks, delay):
+    # ticks at least `delay` us after `ticks`
+    return (ticks + (delay + RESOLUTION - 1) // RESOLUTION) & MASK
+
+
+def diff(end, start):
+    # us from `start` to `end`, negative if `end` comes first
+    delta = (end - start) & MASK
+    if delta >= HALF:
+        delta -= PERIOD
+    return delta * RESOLUTION
+
+
+def deadline(delay):
+    # ticks by which at least `delay` us will have passed, whatever part of
+    # the current tick is already over
+    return add(now(), delay + RESOLUTION - 1)
+
+
+def reached(ticks):
+    return diff(now(), ticks) >= 0
@@ -103,4 +103,71 @@ RXBYTES = 0xFB  # Overflow and Number of Bytes
 RCCTRL1_STATUS = 0xFC  # Last RC Oscillator Calibration Result
 RCCTRL0_STATUS = 0xFD  # Last RC Oscillator Calibration Result
 
+# Chip Status Byte, sent on MISO with every header byte
+
+STATUS_CHIP_RDYN = 0x80  # low once the crystal is running
+STATUS_STATE = 0x70  # main radio control state, one of the STATE_ values
+STATUS_FIFO_BYTES = 0x0F  # RX bytes available (read) or TX bytes free (write)
+
+STATE_IDLE = 0
+STATE_RX = 1
+STATE_TX = 2
+STATE_FSTXON = 3
+STATE_CALIBRATE = 4
+STATE_SETTLING = 5
+STATE_RXFIFO_OVERFLOW = 6
+STATE_TXFIFO_UNDERFLOW = 7
+
 PA_TABLE = [0x00, 0xC0, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
+
+# PATABLE values for an output power in dBm at 433 MHz (datasheet table 39)
+PA_LEVELS = {
+    -30: 0x12,
+    -20: 0x0E,
+    -15: 0x1D,
+    -10: 0x34,
+    0: 0x60,
+    5: 0x84,
+    7: 0xC8,
+    10: 0xC0,
+}
+
+# Register images for a single burst write starting at IOCFG2 (0x00 - 0x2E),
+# RESET_CONFIG holds the values the chip comes up with after SRES.
+# SYNC1/SYNC0 and FREQ2/FREQ1/FREQ0 hold the reset values and are replaced by
+# the CC1101 object's own sync word and frequency before writing.
+
+CONFIG_LENGTH = TEST0 + 1
+
+# Configuration registers the chip updates on its own (synthesizer calibration),
+# these are always read from and written to the chip.
+VOLATILE_CONFIG = (FSCAL3, FSCAL2, FSCAL1)
+
+# fmt: off
+RESET_CONFIG = bytes([
+    0x29, 0x2E, 0x3F, 0x07, 0xD3, 0x91, 0xFF, 0x04,  # IOCFG2 - PKTCTRL1
+    0x45, 0x00, 0x00, 0x0F, 0x00, 0x1E, 0xC4, 0xEC,  # PKTCTRL0 - FREQ0
+    0x8C, 0x22, 0x02, 0x22, 0xF8, 0x47, 0x07, 0x30,  # MDMCFG4 - MCSM1
+    0x04, 0x36, 0x6C, 0x03, 0x40, 0x91, 0x87, 0x6B,  # MCSM0 - WOREVT0
+    0xF8, 0x56, 0x10, 0xA9, 0x0A, 0x20, 0x0D, 0x41,  # WORCTRL - RCCTRL1
+    0x00, 0x59, 0x7F, 0x3F, 0x88, 0x31, 0x0B,        # RCCTRL0 - TEST0
+])
+
+RX_CONFIG = bytes([
+    0x29, 0x2E, 0x06, 0x47, 0xD3, 0x91, 0xFF, 0x00,  # IOCFG2 - PKTCTRL1
+    0x00, 0x00, 0x00, 0x08, 0x00, 0x1E, 0xC4, 0xEC,  # PKTCTRL0 - FREQ0
+    0xF7, 0x10, 0x32, 0x22, 0xF8, 0x00, 0x07, 0x30,  # MDMCFG4 - MCSM1
+    0x18, 0x16, 0x6C, 0x06, 0x00, 0x95, 0x87, 0x6B,  # MCSM0 - WOREVT0
+    0xFB, 0xB6, 0x11, 0xE9, 0x2A, 0x00, 0x1F, 0x41,  # WORCTRL - RCCTRL1
+    0x00, 0x59, 0x7F, 0x3F, 0x81, 0x35, 0x09,        # RCCTRL0 - TEST0
+])
+
+TX_CONFIG = bytes([
+    0x29, 0x2E, 0x06, 0x47, 0xD3, 0x91, 0xFF, 0x00,  # IOCFG2 - PKTCTRL1
+    0x00, 0x00, 0x00, 0x06, 0x00, 0x1E, 0xC4, 0xEC,  # PKTCTRL0 - FREQ0
+    0xE7, 0x10, 0x30, 0x22, 0xF8, 0x15, 0x07, 0x20,  # MDMCFG4 - MCSM1
+    0x18, 0x14, 0x6C, 0x03, 0x00, 0x92, 0x87, 0x6B,  # MCSM0 - WOREVT0
+    0xFB, 0x56, 0x11, 0xE9, 0x2A, 0x00, 0x1F, 0x41,  # WORCTRL - RCCTRL1
+    0x00, 0x59, 0x7F, 0x3F, 0x81, 0x35, 0x0B,        # RCCTRL0 - TEST0
+])
+# fmt: on
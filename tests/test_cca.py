@@ -0,0 +1,68 @@
+import registers as regs
+from cpc import cca, profile
+from cpc.cpc import CC1101
+from cpc.sim import SimulatedAir, SimulatedCC1101
+
+
+def radio(air):
+    sim = SimulatedCC1101(air)
+    radio = CC1101(None, None, sim.gdo0, 50000, 434400000, "666A", device=sim)
+    radio.setPacketMode()
+    return sim, radio
+
+
+def test_calibration_from_idle_takes_time():
+    sim, r = radio(SimulatedAir())
+    r.setupRX()  # MCSM0 FS_AUTOCAL from IDLE
+    r.strobe(regs.SRX)
+    assert r.refresh() == regs.STATE_CALIBRATE
+    r.strobe(regs.STX)  # ignored until the radio is in RX
+    assert r.waitState((regs.STATE_RX, regs.STATE_TX)) == regs.STATE_RX
+
+
+def test_transmits_from_idle():
+    # SRX from IDLE calibrates first, STX must wait for RX
+    air = SimulatedAir()
+    sim, r = radio(air)
+    sense = r.setCarrierSense(threshold=0)
+    r.setupTX()
+    assert r.refresh() == regs.STATE_IDLE
+    assert r.sendPacket(b"hello")
+    assert (sense.clear, sense.busy, sense.failed) == (1, 0, 0)
+
+
+def test_busy_channel_gives_up():
+    air = SimulatedAir()
+    sim, r = radio(air)
+    sense = r.setCarrierSense(threshold=0, slot=100, attempts=3)
+    r.setupTX()
+    sim.inject(bytes(200), datarate=4000)  # 400 ms on the air
+    assert not r.sendPacket(b"hello")
+    assert (sense.clear, sense.busy, sense.failed) == (0, 3, 1)
+    assert r.refresh() == regs.STATE_IDLE
+
+
+def test_short_frame_already_out_counts_as_clear():
+    # with TXOFF_MODE = RX a short frame may be over before the status byte
+    # after STX is read, the TX FIFO tells
+    air = SimulatedAir()
+    sim, r = radio(air)
+    r.setSampleRate(250000)
+    sense = r.setCarrierSense(threshold=0)
+    r.setupTX()
+    assert r.sendMany([b"%02d" % i for i in range(10)]) == 10
+    assert (sense.clear, sense.busy) == (10, 0)
+
+
+def test_load_profile_keeps_carrier_sense():
+    sim, r = radio(SimulatedAir())
+    sense = r.setCarrierSense(threshold=3)
+    image = profile.ProfileCache("666A").get(
+        868300000, 38400, profile.MOD_GFSK, packet=True
+    )
+    image = profile.compileProfile({"MCSM1": 0x00, "AGCCTRL1": 0x40}, image)
+    r.loadProfile(image)
+    assert sim.registers[regs.MCSM1] & 0x30 == cca.CCA_RSSI_PACKET
+    assert sim.registers[regs.AGCCTRL1] & 0x0F == 3
+    assert r.sendPacket(b"x")
+    assert sense.clear == 1
@@ -0,0 +1,59 @@
+from cpc import coding
+
+
+def test_manchester_round_trip():
+    data = bytes(range(256))
+    for ieee in (False, True):
+        encoded = coding.manchesterEncode(data, ieee=ieee)
+        assert len(encoded) == 512
+        decoded, errors = coding.manchesterDecode(encoded, ieee=ieee)
+        assert (decoded, errors) == (data, 0)
+
+
+def test_manchester_symbols():
+    # G.E. Thomas: 1 -> 10, 0 -> 01, IEEE 802.3 the other way round
+    assert coding.manchesterEncode(b"\xf0") == b"\xaa\x55"
+    assert coding.manchesterEncode(b"\xf0", ieee=True) == b"\x55\xaa"
+
+
+def test_manchester_in_place():
+    buffer = bytearray(b"hi\x00\x00")
+    coding.manchesterEncode(buffer[:2], buffer)
+    assert buffer == coding.manchesterEncode(b"hi")
+    out, errors = coding.manchesterDecode(buffer, buffer)
+    assert (bytes(out[:2]), errors) == (b"hi", 0)
+
+
+def test_invalid_symbols_are_flagged():
+    # only the 16 codes of four 01 / 10 symbols are valid, a 00 or 11 symbol
+    # in any of the four positions is flagged
+    flagged = [code for code in range(256) if coding.MANCHESTER_DECODE[code] & 0x10]
+    assert len(flagged) == 256 - 16
+    for shift in (6, 4, 2, 0):
+        code = 0x55 & ~(0b11 << shift)  # one 00 symbol among 01s
+        assert code in flagged
+    assert coding.manchesterDecode(b"\x15\x55")[1] == 1
+
+
+def test_pn9_matches_the_cc1101():
+    assert coding.PN9[:8] == bytes.fromhex("ffe11d9aed853324")
+    assert len(coding.PN9) == coding.PN9_PERIOD
+
+
+def test_whitening_in_parts():
+    data = bytes(range(256)) * 3
+    whole = bytearray(data)
+    assert coding.whiten(whole) == len(data) % coding.PN9_PERIOD
+    parts = bytearray(data)
+    offset = coding.whiten(parts, 0, 100)
+    coding.whiten(parts, 100, offset=offset)
+    assert parts == whole
+    coding.whiten(whole)
+    assert whole == data
+
+
+def test_encode_frame():
+    buffer = bytearray(12)
+    end = coding.encodeFrame(buffer, b"abc", b"\x66\x6a", preamble=4, start=1)
+    assert end == 10
+    assert buffer == b"\x00\xaa\xaa\xaa\xaa\x66\x6aabc\x00\x00"
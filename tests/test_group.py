@@ -0,0 +1,57 @@
+import time
+
+from cpc.group import RadioGroup
+from cpc.sim import SimulatedAir, SimulatedCC1101
+
+FREQUENCY = 434400000
+SYNCWORD = "666A"
+LENGTH = 8
+TIMEOUT = 5  # s
+
+
+def frame(payload):
+    return b"\xaa" * 4 + b"\x66\x6a" + payload
+
+
+def pollUntil(group, received, count):
+    # GDO0 edges are only seen while the group polls
+    deadline = time.monotonic() + TIMEOUT
+    while len(received) < count and time.monotonic() < deadline:
+        group.poll()
+
+
+def radioGroup(count):
+    air = SimulatedAir()
+    group = RadioGroup(None)
+    sims = []
+    received = []
+
+    def handler(radio, buffer):
+        received.append((radio, bytes(buffer)))
+
+    for _ in range(count):
+        sim = SimulatedCC1101(air)
+        group.add(None, sim.gdo0, FREQUENCY, SYNCWORD, LENGTH, handler, device=sim)
+        sims.append(sim)
+    return group, sims, received
+
+
+def test_two_radios_on_one_bus():
+    group, sims, received = radioGroup(2)
+    a, b = group.radios
+    sims[0].inject(frame(b"radio  a"), delay=0.001)
+    sims[1].inject(frame(b"radio  b"), delay=0.002)
+    pollUntil(group, received, 2)
+    assert sorted(received, key=lambda item: item[1]) == [
+        (a, b"radio  a"),
+        (b, b"radio  b"),
+    ]
+
+
+def test_listens_again_after_send():
+    group, sims, received = radioGroup(2)
+    a, b = group.radios
+    assert group.send(a, b"outgoing")
+    sims[0].inject(frame(b"incoming"), delay=0.001)
+    pollUntil(group, received, 1)
+    assert received == [(a, b"incoming")]
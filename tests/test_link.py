@@ -0,0 +1,147 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from cpc import ticks
+from cpc.cpc import CC1101
+from cpc.link import INITIAL_RTO, MAX_RTO, MAX_WINDOW, Link
+from cpc.sim import SimulatedAir, SimulatedCC1101
+
+DATARATE = 38400
+TIMEOUT = 60  # s
+
+
+@pytest.fixture(autouse=True)
+def switchinterval():
+    # two radios in one process, each drains its RX FIFO from its own thread
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(0.0005)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def link(air, address, peer, window=8):
+    sim = SimulatedCC1101(air)
+    radio = CC1101(
+        None, None, sim.gdo0, 50000, 434400000, "666A", device=sim, datarate=DATARATE
+    )
+    radio.setPacketMode(address=address)
+    radio.setupRX()
+    link = Link(radio, peer, window)
+    link.open()
+    return link
+
+
+def exchange(a, b, data, reply=()):
+    # send data from a to b and reply from b to a, both polled until
+    # everything is acknowledged. Returns what b and a received.
+    got = []
+    back = []
+    done = False
+
+    def run():
+        while not done:
+            b.poll()
+            payload = b.receive()
+            while payload is not None:
+                got.append(payload)
+                payload = b.receive()
+
+    for payload in reply:
+        b.send(payload)
+    thread = threading.Thread(target=run)
+    thread.start()
+    start = time.monotonic()
+    for payload in data:
+        a.send(payload)
+    try:
+        while (
+            a.pending() or b.pending() or len(back) < len(reply)
+        ) and time.monotonic() - start < TIMEOUT:
+            a.poll()
+            payload = a.receive()
+            while payload is not None:
+                back.append(payload)
+                payload = a.receive()
+        while len(got) < len(data) and time.monotonic() - start < TIMEOUT:
+            time.sleep(0.001)
+    finally:
+        done = True
+        thread.join()
+    if reply:
+        return got, back
+    return got
+
+
+def test_in_order_delivery_with_loss():
+    air = SimulatedAir(0.2, seed=2)
+    a, b = link(air, 0x01, 0x02), link(air, 0x02, 0x01)
+    data = [b"%03d" % i * 10 for i in range(60)]
+    assert exchange(a, b, data) == data
+    assert a.retransmitted
+    assert a.pending() == 0
+
+
+def test_sequence_numbers_wrap_around():
+    air = SimulatedAir()
+    a, b = link(air, 0x01, 0x02), link(air, 0x02, 0x01)
+    data = [b"%03d" % i for i in range(300)]
+    assert exchange(a, b, data) == data
+    assert a.next == a.base == 300 & 0xFF
+    assert b.expected == 300 & 0xFF
+
+
+def test_both_ends_sending():
+    # bursts from both ends collide, the randomized timers pull them apart
+    air = SimulatedAir()
+    a, b = link(air, 0x01, 0x02), link(air, 0x02, 0x01)
+    data = [b"a%d" % i for i in range(30)]
+    reply = [b"b%d" % i for i in range(10)]
+    assert exchange(a, b, data, reply) == (data, reply)
+
+
+def test_duplicates_are_dropped():
+    a = link(SimulatedAir(), 0x01, 0x02)
+    a.accept(0, b"zero")
+    a.accept(2, b"two")  # ahead of a gap, held
+    a.accept(2, b"two")
+    a.accept(1, b"one")
+    a.accept(0, b"zero")  # delivered before, its ack got lost
+    assert [a.receive() for _ in range(4)] == [b"zero", b"one", b"two", None]
+    assert a.duplicates == 2
+    assert a.expected == 3
+
+
+def test_selective_ack_resends_the_lost_packets():
+    a = link(SimulatedAir(), 0x01, 0x02)
+    for i in range(5):
+        a.send(b"%d" % i)
+    assert a.poll() == 5
+    # 0 arrived and 2, 3 and 4 behind the gap at 1
+    a.acknowledged(1, 0b111)
+    assert a.base == 1
+    assert [a.resend[seq % MAX_WINDOW] for seq in range(1, 5)] == [
+        True,
+        False,
+        False,
+        False,
+    ]
+    assert a.poll() == 1
+    assert (a.sent, a.retransmitted) == (6, 1)
+
+
+def test_timeout_backs_off():
+    a = link(SimulatedAir(), 0x01, 0x02)
+    a.send(b"x")
+    assert a.poll() == 1
+    assert a.rto == INITIAL_RTO
+    a.deadline = ticks.now()
+    assert a.poll() == 1  # the timer ran out, sent again
+    assert (a.timeouts, a.retransmitted, a.rto) == (1, 1, 2 * INITIAL_RTO)
+    while a.rto < MAX_RTO:
+        a.expire()
+    a.expire()
+    assert a.rto == MAX_RTO
+    assert a.resend[a.base % MAX_WINDOW]